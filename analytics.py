@@ -0,0 +1,186 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from catalog import CATALOG_CSV, FEATURE_COLUMNS, load_tracks, catalog_version
+from tracing import traced
+
+#***************************************************************
+# Precomputed statistics of the song library of every user
+#***************************************************************
+
+# Number of bins of the audio feature histograms
+HISTOGRAM_BINS = 20
+
+# Bin edges of every feature, they are the same for all users: catalog version -> {feature: edges}
+_edges_cache = {}
+
+# Histograms of the whole catalog, read once from the songs database: (db path, catalog version) -> histograms
+_catalog_histograms = {}
+
+# Summaries that were already read in this process: (library_path, user_id) -> ((version, catalog version), summary)
+_summary_cache = OrderedDict()
+_analytics_lock = threading.Lock()
+
+# Summaries kept in the cache, the least recently used summary is dropped first
+MAX_CACHED_SUMMARIES = 500
+
+
+# Function to create the tables of the statistics in library.db (called by library.ensure_library):
+#   user_analytics_meta      (user_id, version, catalog_version)
+#   user_artist_counts       (user_id, track_artist, count)
+#   user_genre_counts        (user_id, playlist_genre, count)
+#   user_feature_histograms  (user_id, feature, bin, count)
+# The version of a user is increased with every change, it is the key of the cache.
+def ensure_analytics_tables(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS user_analytics_meta (
+        user_id TEXT PRIMARY KEY, version INTEGER NOT NULL, catalog_version TEXT NOT NULL)""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS user_artist_counts (
+        user_id TEXT NOT NULL, track_artist TEXT NOT NULL, count INTEGER NOT NULL,
+        PRIMARY KEY (user_id, track_artist)) WITHOUT ROWID""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS user_genre_counts (
+        user_id TEXT NOT NULL, playlist_genre TEXT NOT NULL, count INTEGER NOT NULL,
+        PRIMARY KEY (user_id, playlist_genre)) WITHOUT ROWID""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS user_feature_histograms (
+        user_id TEXT NOT NULL, feature TEXT NOT NULL, bin INTEGER NOT NULL, count INTEGER NOT NULL,
+        PRIMARY KEY (user_id, feature, bin)) WITHOUT ROWID""")
+
+
+# Returns the bin edges of every audio feature (HISTOGRAM_BINS bins between the smallest and largest value
+# of the catalog). They are computed once per catalog version.
+def feature_edges(csv_path=CATALOG_CSV):
+    version = catalog_version(csv_path)
+    with _analytics_lock:
+        if version not in _edges_cache:
+            tracks = load_tracks(csv_path)
+            _edges_cache.clear()
+            _edges_cache[version] = {
+                feature: np.histogram_bin_edges(tracks[feature].dropna().to_numpy(dtype=np.float64), bins=HISTOGRAM_BINS)
+                for feature in FEATURE_COLUMNS
+            }
+        return _edges_cache[version]
+
+
+# Returns the histograms of all tracks of the catalog: {feature: (counts, edges)}. They are written by
+# ingest.py (table feature_histograms) and only read once per process and catalog version.
+def catalog_histograms(conn, db_path, csv_path=CATALOG_CSV):
+    key = (db_path, catalog_version(csv_path))
+    with _analytics_lock:
+        if key in _catalog_histograms:
+            return _catalog_histograms[key]
+    rows = conn.execute("SELECT feature, low, high, count FROM feature_histograms ORDER BY feature, bin").fetchall()
+    histograms = {}
+    for feature in FEATURE_COLUMNS:
+        feature_rows = [row for row in rows if row[0] == feature]
+        if feature_rows:
+            edges = np.array([row[1] for row in feature_rows] + [feature_rows[-1][2]])
+            histograms[feature] = (np.array([row[3] for row in feature_rows], dtype=np.int64), edges)
+    with _analytics_lock:
+        _catalog_histograms.clear()
+        _catalog_histograms[key] = histograms
+    return histograms
+
+
+# Function to put every value into its bin (the largest value belongs to the last bin, like np.histogram)
+def bin_counts(values, edges):
+    values = values[~np.isnan(values)]
+    bins = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+    return np.bincount(bins, minlength=len(edges) - 1)
+
+
+# Function to count artists, genres and feature bins of a list of track ids (a track can occur several times)
+def _track_counts(track_ids, csv_path):
+    songs = load_tracks(csv_path).reindex(list(track_ids))
+    artists = songs["track_artist"].value_counts()
+    genres = songs["playlist_genre"].value_counts()
+    histograms = {feature: bin_counts(songs[feature].to_numpy(dtype=np.float64), edges)
+                  for feature, edges in feature_edges(csv_path).items()}
+    return artists[artists > 0], genres[genres > 0], histograms
+
+
+# Function to add counts to the tables of a user
+def _add_counts(conn, user_id, counts):
+    artists, genres, histograms = counts
+    conn.executemany("""INSERT INTO user_artist_counts (user_id, track_artist, count) VALUES (?, ?, ?)
+                        ON CONFLICT (user_id, track_artist) DO UPDATE SET count = count + excluded.count""",
+                     [(user_id, str(artist), int(count)) for artist, count in artists.items()])
+    conn.executemany("""INSERT INTO user_genre_counts (user_id, playlist_genre, count) VALUES (?, ?, ?)
+                        ON CONFLICT (user_id, playlist_genre) DO UPDATE SET count = count + excluded.count""",
+                     [(user_id, str(genre), int(count)) for genre, count in genres.items()])
+    conn.executemany("""INSERT INTO user_feature_histograms (user_id, feature, bin, count) VALUES (?, ?, ?, ?)
+                        ON CONFLICT (user_id, feature, bin) DO UPDATE SET count = count + excluded.count""",
+                     [(user_id, feature, int(bin), int(count))
+                      for feature, counts in histograms.items() for bin, count in enumerate(counts) if count])
+
+
+# Function to count all songs of a user again (first use, or the catalog and with it the bin edges changed)
+@traced("analytics.rebuild")
+def _rebuild_user_analytics(conn, user_id, csv_path):
+    for table in ["user_artist_counts", "user_genre_counts", "user_feature_histograms"]:
+        conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+    track_ids = [row[0] for row in conn.execute(
+        """SELECT t.track_id FROM playlists p JOIN playlist_tracks t ON t.playlist_id = p.playlist_id
+           WHERE p.user_id = ?""", (user_id,))]
+    _add_counts(conn, user_id, _track_counts(track_ids, csv_path))
+    conn.execute("""INSERT INTO user_analytics_meta (user_id, version, catalog_version) VALUES (?, 1, ?)
+                    ON CONFLICT (user_id) DO UPDATE SET version = version + 1, catalog_version = excluded.catalog_version""",
+                 (user_id, catalog_version(csv_path)))
+
+
+# Function to check if the statistics of a user exist and were counted with the bins of the current catalog
+def _is_current(conn, user_id, csv_path):
+    meta = conn.execute("SELECT catalog_version FROM user_analytics_meta WHERE user_id = ?", (user_id,)).fetchone()
+    return meta is not None and meta[0] == catalog_version(csv_path)
+
+
+# Adds the tracks of a new playlist to the statistics of the user. It is called in the same transaction
+# that inserts the playlist (the tracks are already in playlist_tracks), so both are saved together.
+def update_user_analytics(conn, user_id, track_ids, csv_path=CATALOG_CSV):
+    if not _is_current(conn, user_id, csv_path):
+        _rebuild_user_analytics(conn, user_id, csv_path)
+        return
+    _add_counts(conn, user_id, _track_counts(track_ids, csv_path))
+    conn.execute("UPDATE user_analytics_meta SET version = version + 1 WHERE user_id = ?", (user_id,))
+
+
+# Returns the statistics of a user's library:
+#   {"version": version of the library, "artists": Series artist -> count (most songs first),
+#    "genres": Series genre -> count, "histograms": {feature: (counts, edges)}}
+# Only the version of the user is read from the database if the summary is already cached.
+def user_analytics(conn, user_id, library_path, csv_path=CATALOG_CSV):
+    if not _is_current(conn, user_id, csv_path):
+        _rebuild_user_analytics(conn, user_id, csv_path)
+    key = (library_path, user_id)
+    version = conn.execute("SELECT version, catalog_version FROM user_analytics_meta WHERE user_id = ?",
+                           (user_id,)).fetchone()
+    with _analytics_lock:
+        cached = _summary_cache.get(key)
+        if cached is not None and cached[0] == version:
+            _summary_cache.move_to_end(key)
+            return cached[1]
+
+    artists = pd.read_sql_query(
+        "SELECT track_artist, count FROM user_artist_counts WHERE user_id = ? ORDER BY count DESC, track_artist",
+        conn, params=(user_id,)).set_index("track_artist")["count"]
+    genres = pd.read_sql_query(
+        "SELECT playlist_genre, count FROM user_genre_counts WHERE user_id = ? ORDER BY count DESC, playlist_genre",
+        conn, params=(user_id,)).set_index("playlist_genre")["count"]
+    histograms = {feature: (np.zeros(len(edges) - 1, dtype=np.int64), edges)
+                  for feature, edges in feature_edges(csv_path).items()}
+    for feature, bin, count in conn.execute(
+            "SELECT feature, bin, count FROM user_feature_histograms WHERE user_id = ?", (user_id,)):
+        if feature in histograms:
+            histograms[feature][0][bin] = count
+    summary = {"version": version, "artists": artists, "genres": genres, "histograms": histograms}
+
+    with _analytics_lock:
+        _summary_cache[key] = (version, summary)
+        _summary_cache.move_to_end(key)
+        while len(_summary_cache) > MAX_CACHED_SUMMARIES:
+            _summary_cache.popitem(last=False)
+    return summary
+
+
+# Marks the statistics of a user as outdated, they are counted again on the next use
+def invalidate_user_analytics(conn, user_id):
+    conn.execute("UPDATE user_analytics_meta SET catalog_version = '' WHERE user_id = ?", (user_id,))
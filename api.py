@@ -0,0 +1,330 @@
+import os
+import time
+import uuid
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import Flask, Response, g, jsonify, request
+from catalog import CATALOG_CSV, FEATURE_COLUMNS, load_catalog, load_tracks, script_dir
+from ingest import SONGS_DB, ensure_catalog_db
+from db import connection
+from search import search_tracks, page_count, PAGE_SIZE as SEARCH_PAGE_SIZE
+from feature_filter import FILTER_COLUMNS, filter_tracks, PAGE_SIZE as FILTER_PAGE_SIZE
+from recommend import RECOMMENDATION_MODES, recommend_batch
+from library import LIBRARY_DB, save_playlist
+from tracing import prometheus_text, record_span
+from auth import authenticate, create_session, get_session, ensure_auth_tables, AuthBusyError, LoginRateLimitError
+
+#***************************************************************
+# JSON API for search, filter, recommendations and playlists (without the Streamlit UI)
+#***************************************************************
+
+USERS_DB = os.path.join(script_dir, "users.db")
+
+# Recommendations run in a pool of worker threads, so the number of parallel index queries is limited
+API_WORKERS = int(os.environ.get("API_WORKERS", "4"))
+
+# Seconds a synchronous request waits for its result
+REQUEST_TIMEOUT = 30
+
+# Largest number of baskets in one batch request and largest number of songs per basket
+MAX_BATCH = 64
+MAX_RECOMMENDATIONS = 500
+
+# Results of asynchronous jobs are kept for JOB_TTL seconds after they are finished
+JOB_TTL = 10 * 60
+MAX_JOBS = 1000
+
+# Columns of the songs returned by the API
+TRACK_COLUMNS = ["track_id", "track_name", "track_artist", "track_album_name", "playlist_genre"]
+
+app = Flask(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api")
+
+# Asynchronous jobs: job id -> {"future": ..., "created_at": ..., "finished_at": ...}
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class ApiError(Exception):
+    # details are added to the JSON body of the error, e.g. {"unknown_track_ids": [...]}
+    def __init__(self, message, status=400, details=None):
+        super().__init__(message)
+        self.status = status
+        self.details = details or {}
+
+
+# Every request is measured as span "api.<endpoint>" (tracing.py)
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.teardown_request
+def _record_request_span(error):
+    if "request_started" in g:
+        record_span(f"api.{request.endpoint}", time.perf_counter() - g.request_started)
+
+
+@app.errorhandler(ApiError)
+def _api_error(error):
+    return jsonify({"error": str(error), **error.details}), error.status
+
+
+@app.errorhandler(ValueError)
+def _value_error(error):
+    return jsonify({"error": str(error)}), 400
+
+
+@app.errorhandler(AuthBusyError)
+def _auth_busy(error):
+    return jsonify({"error": str(error)}), 503
+
+
+@app.errorhandler(LoginRateLimitError)
+def _login_rate_limit(error):
+    return jsonify({"error": str(error)}), 429, {"Retry-After": str(int(error.retry_after) + 1)}
+
+
+# Function to turn a dataframe into a list of JSON objects (NaN becomes null)
+def _records(df):
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+# Function to read the JSON body of a request
+def _json_body():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        raise ApiError("The request body must be a JSON object")
+    return body
+
+
+def _int_arg(value, name, default, low=1, high=None):
+    try:
+        value = default if value is None else int(value)
+    except (TypeError, ValueError):
+        raise ApiError(f"{name} must be a number")
+    if value < low:
+        raise ApiError(f"{name} must be at least {low}")
+    if high is not None and value > high:
+        raise ApiError(f"{name} must be at most {high}")
+    return value
+
+
+# Returns the user_id of the session token in the Authorization header (Bearer <token>)
+def _session_user():
+    header = request.headers.get("Authorization", "")
+    session = get_session(header[len("Bearer "):]) if header.startswith("Bearer ") else None
+    if session is None:
+        raise ApiError("Login required", 401)
+    return session[0]
+
+
+# Function to check one basket of a recommendation request: {"track_ids": [...], "n": 50, "mode": "centroid"}
+def _parse_recommendation(body):
+    track_ids = body.get("track_ids")
+    if not isinstance(track_ids, list) or not track_ids:
+        raise ApiError("track_ids must be a non-empty list")
+    n = _int_arg(body.get("n"), "n", 50, high=MAX_RECOMMENDATIONS)
+    mode = body.get("mode", "centroid")
+    if mode not in RECOMMENDATION_MODES:
+        raise ApiError(f"mode must be one of {list(RECOMMENDATION_MODES)}")
+    return [str(track_id) for track_id in track_ids], n, mode
+
+
+# Computes the recommendations of several baskets with one query on the index (recommend.recommend_batch).
+# Unknown track ids are left out and returned in "unknown_track_ids".
+def _run_recommendations(baskets):
+    from knn_index import load_knn_index
+
+    tracks = load_tracks(CATALOG_CSV)
+    catalog_df = load_catalog(CATALOG_CSV)
+    knn = load_knn_index(CATALOG_CSV)
+
+    requests, unknown = [], []
+    for track_ids, n, mode in baskets:
+        known = [track_id for track_id in dict.fromkeys(track_ids) if track_id in tracks.index]
+        unknown.append([track_id for track_id in track_ids if track_id not in tracks.index])
+        requests.append((tracks.loc[known, FEATURE_COLUMNS].to_numpy(), known, n, mode))
+
+    results = []
+    # Baskets without a known song get an empty result, the others are searched together
+    searchable = [index for index, (features, _, _, _) in enumerate(requests) if len(features)]
+    found = dict(zip(searchable, recommend_batch(knn, catalog_df, [requests[index] for index in searchable])))
+    for index, (_, _, _, mode) in enumerate(requests):
+        songs = []
+        if index in found:
+            rows, scores = found[index]
+            songs_df = catalog_df.iloc[rows][TRACK_COLUMNS].assign(score=scores.round(4))
+            songs = _records(songs_df)
+        results.append({"mode": mode, "songs": songs, "unknown_track_ids": unknown[index]})
+    return results
+
+
+# Function to remove finished jobs that are older than JOB_TTL
+def _expire_jobs(now):
+    for job_id in [job_id for job_id, job in _jobs.items()
+                   if job["finished_at"] is not None and job["finished_at"] + JOB_TTL < now]:
+        del _jobs[job_id]
+
+
+def _finish_job(job_id):
+    with _jobs_lock:
+        if job_id in _jobs:
+            _jobs[job_id]["finished_at"] = time.time()
+
+
+# Starts a job in the worker pool and returns its id (the result is fetched with GET /api/jobs/<id>)
+def _submit_job(function, *args):
+    now = time.time()
+    with _jobs_lock:
+        _expire_jobs(now)
+        if len(_jobs) >= MAX_JOBS:
+            raise ApiError("Too many jobs, please try again later", 503)
+        job_id = uuid.uuid4().hex
+        future = _executor.submit(function, *args)
+        _jobs[job_id] = {"future": future, "created_at": now, "finished_at": None}
+    future.add_done_callback(lambda _: _finish_job(job_id))
+    return job_id
+
+
+@app.post("/api/login")
+def login():
+    body = _json_body()
+    ensure_auth_tables(USERS_DB)
+    user_id = authenticate(USERS_DB, str(body.get("username", "")), str(body.get("password", "")))
+    if not user_id:
+        raise ApiError("Incorrect user name or password", 401)
+    return jsonify({"user_id": user_id, "token": create_session(user_id, body["username"])})
+
+
+# GET /api/search?column=track_artist&query=...&page=1&page_size=50
+@app.get("/api/search")
+def search():
+    column = request.args.get("column", "track_name")
+    query = request.args.get("query", "")
+    if not query:
+        raise ApiError("query is required")
+    page = _int_arg(request.args.get("page"), "page", 1)
+    page_size = _int_arg(request.args.get("page_size"), "page_size", SEARCH_PAGE_SIZE, high=MAX_RECOMMENDATIONS)
+    ensure_catalog_db(CATALOG_CSV, SONGS_DB)
+    with connection(SONGS_DB) as conn:
+        songs_df, total = search_tracks(conn, column, query, TRACK_COLUMNS, page, page_size)
+    return jsonify({"songs": _records(songs_df), "total": total, "page": page,
+                    "pages": page_count(total, page_size)})
+
+
+# POST /api/filter {"ranges": {"tempo": [100, 120], ...}, "page": 1, "page_size": 100}
+@app.post("/api/filter")
+def filter_songs():
+    body = _json_body()
+    ranges = body.get("ranges", {})
+    if not isinstance(ranges, dict) or any(column not in FILTER_COLUMNS for column in ranges):
+        raise ApiError(f"ranges must be an object with the keys {FILTER_COLUMNS}")
+    try:
+        ranges = {column: (float(low), float(high)) for column, (low, high) in ranges.items()}
+    except (TypeError, ValueError):
+        raise ApiError("Every range must be a list [low, high]")
+    page = _int_arg(body.get("page"), "page", 1)
+    page_size = _int_arg(body.get("page_size"), "page_size", FILTER_PAGE_SIZE, high=MAX_RECOMMENDATIONS)
+    columns = TRACK_COLUMNS + [column for column in ranges if column not in TRACK_COLUMNS]
+    songs_df, total = filter_tracks(ranges, columns, page, page_size, CATALOG_CSV)
+    return jsonify({"songs": _records(songs_df), "total": total, "page": page,
+                    "pages": page_count(total, page_size)})
+
+
+# POST /api/recommend with one basket {"track_ids": [...], "n": 50, "mode": "centroid"}
+# or a batch {"requests": [{...}, {...}]}. With ?async=1 the request returns a job id at once.
+@app.post("/api/recommend")
+def recommend():
+    body = _json_body()
+    batch = "requests" in body
+    if batch:
+        if not isinstance(body["requests"], list) or not 0 < len(body["requests"]) <= MAX_BATCH:
+            raise ApiError(f"requests must be a list of 1 to {MAX_BATCH} baskets")
+        if not all(isinstance(item, dict) for item in body["requests"]):
+            raise ApiError("Every basket must be a JSON object")
+        baskets = [_parse_recommendation(item) for item in body["requests"]]
+    else:
+        baskets = [_parse_recommendation(body)]
+
+    if request.args.get("async") == "1":
+        return jsonify({"job_id": _submit_job(_run_recommendations, baskets)}), 202
+
+    try:
+        results = _executor.submit(_run_recommendations, baskets).result(timeout=REQUEST_TIMEOUT)
+    except FutureTimeoutError:
+        raise ApiError("The recommendation took too long, try ?async=1", 504)
+    return jsonify({"results": results} if batch else results[0])
+
+
+# Status and result of an asynchronous job
+@app.get("/api/jobs/<job_id>")
+def job(job_id):
+    with _jobs_lock:
+        entry = _jobs.get(job_id)
+    if entry is None:
+        raise ApiError("Unknown job", 404)
+    future = entry["future"]
+    if not future.done():
+        return jsonify({"status": "running"}), 202
+    error = future.exception()
+    if error is not None:
+        return jsonify({"status": "failed", "error": str(error)}), 200
+    return jsonify({"status": "done", "results": future.result()})
+
+
+# POST /api/playlists {"name": "...", "track_ids": [...], "scores": [...]}, needs the token of /api/login
+@app.post("/api/playlists")
+def create_playlist():
+    user_id = _session_user()
+    body = _json_body()
+    name = str(body.get("name", "")).strip()
+    track_ids = body.get("track_ids")
+    scores = body.get("scores")
+    if not name:
+        raise ApiError("name is required")
+    if not isinstance(track_ids, list) or not track_ids:
+        raise ApiError("track_ids must be a non-empty list")
+    if scores is not None and (not isinstance(scores, list) or len(scores) != len(track_ids)):
+        raise ApiError("scores must be a list with one score per track")
+    track_ids = [str(track_id) for track_id in track_ids]
+    unknown = [track_id for track_id in dict.fromkeys(track_ids) if track_id not in load_tracks(CATALOG_CSV).index]
+    if unknown:
+        raise ApiError("track_ids contains songs that are not in the catalog", details={"unknown_track_ids": unknown})
+    # A song is saved once per playlist, with the score of its first occurrence
+    first = {}
+    for position, track_id in enumerate(track_ids):
+        first.setdefault(track_id, position)
+    track_ids = list(first)
+    if scores is not None:
+        scores = [scores[position] for position in first.values()]
+    playlist_id = save_playlist(user_id, name, track_ids, scores, library_path=LIBRARY_DB, csv_path=CATALOG_CSV)
+    return jsonify({"playlist_id": playlist_id}), 201
+
+
+# Percentiles of the traced operations (SQL, index, catalog) in the Prometheus text format
+@app.get("/metrics")
+def metrics():
+    return Response(prometheus_text(), mimetype="text/plain; version=0.0.4")
+
+
+# Command line entry point for a development server: python api.py [--port 8000] [--warm-up].
+# In production the app is served by a WSGI server with one process per instance (the login sessions
+# are kept in the process), e.g. gunicorn --workers 1 --threads 8 api:app
+def main():
+    parser = argparse.ArgumentParser(description="JSON API of Track Finder")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--warm-up", action="store_true", help="load catalog and indexes before the first request")
+    args = parser.parse_args()
+
+    if args.warm_up:
+        from warmup import warm_up
+        warm_up(CATALOG_CSV, SONGS_DB)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
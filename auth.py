@@ -0,0 +1,157 @@
+import os
+import time
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import bcrypt
+from db import connection
+
+#***************************************************************
+# Password hashing, login sessions and login rate limits
+#***************************************************************
+
+# Cost factor of bcrypt (every +1 doubles the time of a hash), can be set with the environment variable
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+
+# bcrypt runs in a small pool of worker threads, so a burst of logins cannot use all CPUs
+AUTH_WORKERS = int(os.environ.get("AUTH_WORKERS", "2"))
+
+# Maximum number of hashes waiting for a worker, further logins are rejected until the queue is shorter
+MAX_PENDING = AUTH_WORKERS * 8
+
+# Seconds a login waits for its hash before it gives up
+HASH_TIMEOUT = 10
+
+# A username is blocked after MAX_FAILED_LOGINS failed logins within LOGIN_WINDOW seconds
+MAX_FAILED_LOGINS = 5
+LOGIN_WINDOW = 15 * 60
+
+# Seconds a login session stays valid
+SESSION_TTL = 12 * 60 * 60
+
+_executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="bcrypt")
+_pending = threading.BoundedSemaphore(MAX_PENDING)
+
+# Verified sessions: token -> (user_id, username, expires_at)
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# users.db files whose tables were already created in this process
+_created_auth_tables = set()
+
+
+class AuthBusyError(Exception):
+    pass
+
+
+class LoginRateLimitError(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many failed logins, try again in {int(retry_after // 60) + 1} minutes.")
+        self.retry_after = retry_after
+
+
+# Function to run a bcrypt call in the worker pool and wait for the result. The place in the queue is given
+# back when the hash is done, not when the login gives up waiting, so hashes that run on still count.
+def _run_bcrypt(function, *args):
+    if not _pending.acquire(blocking=False):
+        raise AuthBusyError("The server is busy, please try again in a moment.")
+    try:
+        future = _executor.submit(function, *args)
+    except Exception:
+        _pending.release()
+        raise
+    future.add_done_callback(lambda _: _pending.release())
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except FuturesTimeoutError:
+        raise AuthBusyError("The server is busy, please try again in a moment.") from None
+
+
+# Hash-function, creation and storing of the password
+def hash_password(password):
+    return _run_bcrypt(lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)))
+
+
+def check_password(password, hashed):
+    return _run_bcrypt(lambda: bcrypt.checkpw(password.encode('utf-8'), hashed))
+
+
+# Function to create the tables of users.db (users and failed logins), only once per process and database file
+def ensure_auth_tables(users_db):
+    if users_db in _created_auth_tables:
+        return
+    with connection(users_db) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, username TEXT, password TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS login_attempts (username TEXT NOT NULL, attempted_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_login_attempts ON login_attempts (username, attempted_at)")
+    _created_auth_tables.add(users_db)
+
+
+# Raises LoginRateLimitError if the username has too many failed logins in the last LOGIN_WINDOW seconds
+def check_rate_limit(users_db, username, now=None):
+    now = time.time() if now is None else now
+    with connection(users_db) as conn:
+        attempts = conn.execute(
+            "SELECT attempted_at FROM login_attempts WHERE username = ? AND attempted_at > ? ORDER BY attempted_at",
+            (username, now - LOGIN_WINDOW)).fetchall()
+    if len(attempts) >= MAX_FAILED_LOGINS:
+        # The block ends when the oldest attempt that still counts leaves the window
+        raise LoginRateLimitError(attempts[-MAX_FAILED_LOGINS][0] + LOGIN_WINDOW - now)
+
+
+def _record_failed_login(users_db, username, now):
+    with connection(users_db) as conn:
+        conn.execute("INSERT INTO login_attempts (username, attempted_at) VALUES (?, ?)", (username, now))
+        conn.execute("DELETE FROM login_attempts WHERE attempted_at < ?", (now - LOGIN_WINDOW,))
+
+
+# Checks username and password. Returns the user_id or None. The rate limit is checked before
+# bcrypt runs, so a blocked username costs no hashing time.
+def authenticate(users_db, username, password):
+    now = time.time()
+    check_rate_limit(users_db, username, now)
+    with connection(users_db) as conn:
+        user = conn.execute("SELECT user_id, password FROM users WHERE username = ?", (username,)).fetchone()
+    if user and check_password(password, user[1]):
+        with connection(users_db) as conn:
+            conn.execute("DELETE FROM login_attempts WHERE username = ?", (username,))
+        return user[0]
+    _record_failed_login(users_db, username, now)
+    return None
+
+
+# Creates a session after a successful login, the token is kept in st.session_state
+def create_session(user_id, username):
+    token = secrets.token_urlsafe(32)
+    now = time.time()
+    with _sessions_lock:
+        _purge_expired_sessions(now)
+        _sessions[token] = (user_id, username, now + SESSION_TTL)
+    return token
+
+
+# Function to remove the expired sessions (also the ones that are never looked up again), the caller holds
+# _sessions_lock. All sessions have the same TTL, so the dict is ordered by expiry and only the oldest are checked.
+def _purge_expired_sessions(now):
+    while _sessions:
+        oldest = next(iter(_sessions))
+        if _sessions[oldest][2] >= now:
+            break
+        del _sessions[oldest]
+
+
+# Returns (user_id, username) of a valid session or None. This is only a dict lookup, reruns don't run bcrypt.
+def get_session(token):
+    with _sessions_lock:
+        session = _sessions.get(token)
+        if session is None:
+            return None
+        if session[2] < time.time():
+            del _sessions[token]
+            return None
+        return session[0], session[1]
+
+
+def end_session(token):
+    with _sessions_lock:
+        _sessions.pop(token, None)
@@ -0,0 +1,343 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from catalog import FEATURE_COLUMNS, load_catalog, load_tracks, catalog_version, read_catalog
+from db import connection, close_all
+
+#***************************************************************
+# Benchmarks of the app with synthetic catalogs
+#***************************************************************
+
+# Catalog sizes (number of distinct tracks)
+SIZES = {"30k": 30_000, "1m": 1_000_000, "5m": 5_000_000}
+
+# Shape of the real dataset: a track is listed in ~1.15 playlists, one artist has ~3 tracks,
+# a playlist has ~70 tracks, 6 genres with 4 subgenres each
+ROWS_PER_TRACK = 1.15
+TRACKS_PER_ARTIST = 3
+TRACKS_PER_PLAYLIST = 70
+GENRES = {
+    "pop": ["dance pop", "post-teen pop", "electropop", "indie poptimism"],
+    "rap": ["hip hop", "southern hip hop", "gangster rap", "trap"],
+    "rock": ["album rock", "classic rock", "permanent wave", "hard rock"],
+    "latin": ["tropical", "latin pop", "reggaeton", "latin hip hop"],
+    "r&b": ["urban contemporary", "hip pop", "new jack swing", "neo soul"],
+    "edm": ["electro house", "big room", "pop edm", "progressive electro house"],
+}
+WORDS = ["love", "night", "baby", "heart", "fire", "dance", "summer", "dream", "light", "girl", "time", "home",
+         "world", "money", "wild", "blue", "gold", "rain", "city", "run", "feel", "sky", "moon", "life"]
+
+# Scenarios in the order they run, a scenario needs the results of the scenarios before it
+SCENARIOS = ["csv_load", "columnar_load", "db_ingest", "search_short_artist", "search_short_name", "search_fts_artist", "search_fts_name",
+             "filter_index_build", "filter_estimate", "filter_query", "knn_fit", "knn_query", "playlist_save",
+             "viz_analytics", "viz_charts"]
+
+# Differences to the baseline below this many seconds are timer noise and never count as regression
+MIN_REGRESSION_S = 0.01
+
+
+# Function to draw the audio features with distributions close to the real dataset
+def _audio_features(rng, n):
+    instrumental = rng.random(n) < 0.25
+    return {
+        "danceability": rng.beta(5.0, 3.0, n),
+        "energy": rng.beta(4.0, 2.0, n),
+        "key": rng.integers(0, 12, n).astype(np.float64),
+        "loudness": np.clip(rng.normal(-6.7, 3.0, n), -46.0, 1.3),
+        "mode": (rng.random(n) < 0.56).astype(np.float64),
+        "speechiness": np.clip(rng.lognormal(-2.7, 0.8, n), 0.0, 0.92),
+        "acousticness": rng.beta(0.6, 2.5, n),
+        "instrumentalness": np.where(instrumental, rng.beta(0.5, 1.5, n), rng.random(n) * 1e-4),
+        "liveness": np.clip(rng.lognormal(-1.8, 0.6, n), 0.0, 1.0),
+        "valence": rng.beta(2.5, 2.2, n),
+        "tempo": np.clip(rng.normal(121.0, 27.0, n), 40.0, 240.0),
+        "duration_ms": np.clip(rng.normal(225_000, 60_000, n), 30_000, 520_000).round(),
+    }
+
+
+# Writes a synthetic catalog with the columns of spotify_songs.csv and returns the number of rows
+def generate_catalog(n_tracks, path, seed=42):
+    rng = np.random.default_rng(seed)
+    n_artists = max(1, n_tracks // TRACKS_PER_ARTIST)
+    n_playlists = max(1, n_tracks // TRACKS_PER_PLAYLIST)
+    genre_names = list(GENRES)
+
+    # Popular artists have many tracks (Zipf distribution)
+    artist_of_track = (rng.zipf(1.6, n_tracks) - 1) % n_artists
+    genre_of_artist = rng.integers(0, len(genre_names), n_artists)
+    features = _audio_features(rng, n_tracks)
+
+    # Every track is listed in one or more playlists of its genre
+    n_rows = int(n_tracks * ROWS_PER_TRACK)
+    track_of_row = np.concatenate([np.arange(n_tracks), rng.integers(0, n_tracks, n_rows - n_tracks)])
+    genre_of_row = genre_of_artist[artist_of_track[track_of_row]]
+    subgenre_of_row = rng.integers(0, 4, n_rows)
+    playlist_of_row = (genre_of_row + len(genre_names) * rng.integers(0, max(1, n_playlists // len(genre_names)), n_rows))
+
+    words = np.array(WORDS)
+    track_names = pd.Series(words[rng.integers(0, len(WORDS), n_tracks)]).str.cat(
+        words[rng.integers(0, len(WORDS), n_tracks)], sep=" ").str.title()
+    df = pd.DataFrame({
+        "track_id": pd.Series(np.arange(n_tracks)).map("{:022x}".format).to_numpy()[track_of_row],
+        "track_name": track_names.to_numpy()[track_of_row],
+        "track_artist": pd.Series(artist_of_track).map("Artist {}".format).to_numpy()[track_of_row],
+        "track_popularity": rng.integers(0, 101, n_tracks)[track_of_row],
+        "track_album_id": pd.Series(np.arange(n_tracks) // 10).map("{:022x}".format).to_numpy()[track_of_row],
+        "track_album_name": pd.Series(np.arange(n_tracks) // 10).map("Album {}".format).to_numpy()[track_of_row],
+        "track_album_release_date": pd.Series(rng.integers(1960, 2021, n_tracks)).astype(str).to_numpy()[track_of_row],
+        "playlist_name": pd.Series(playlist_of_row).map("Playlist {}".format).to_numpy(),
+        "playlist_id": pd.Series(playlist_of_row).map("{:022x}".format).to_numpy(),
+        "playlist_genre": np.array(genre_names)[genre_of_row],
+        "playlist_subgenre": [GENRES[genre_names[genre]][sub] for genre, sub in zip(genre_of_row, subgenre_of_row)],
+    })
+    for column in FEATURE_COLUMNS:
+        df[column] = features[column][track_of_row]
+    # A track can be listed only once per playlist
+    df = df.drop_duplicates(["track_id", "playlist_id"])
+    df.to_csv(path, index=False)
+    return len(df)
+
+
+# Function to write the columnar copies of the benchmark catalogs into workdir. With CATALOG_SHARED_DIR they would be
+# published into the directory of the running servers, and removing old versions there deletes copies they still map.
+def _use_own_columnar_dir(workdir):
+    import columnar
+    columnar.SHARED_DIR = os.path.join(workdir, columnar.COLUMNAR_DIRNAME)
+
+
+# Runs function repeat times and returns the durations (seconds)
+def _measure(function, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _summary(durations, items):
+    durations = np.asarray(durations)
+    median = float(np.median(durations))
+    return {
+        "runs": len(durations),
+        "min_s": round(float(durations.min()), 6),
+        "median_s": round(median, 6),
+        "p95_s": round(float(np.percentile(durations, 95)), 6),
+        "items": items,
+        "throughput_per_s": round(items / median, 2) if median > 0 else None,
+    }
+
+
+# Runs the scenarios on the catalog csv_path. All files are written into workdir.
+# Returns {scenario: summary}, scenarios that can't run here get {"skipped": reason}.
+def run_scenarios(csv_path, workdir, repeat=5, scenarios=SCENARIOS):
+    from ingest import ingest_catalog
+    from columnar import ensure_columnar_catalog, read_columnar_catalog
+    from search import search_tracks
+    from feature_filter import FeatureFilterIndex, load_filter_index
+    from knn_index import build_knn_index, load_knn_index
+    from recommend import RECOMMENDATION_MODES, recommend
+    from library import save_playlist, load_user_analytics
+
+    _use_own_columnar_dir(workdir)
+    songs_db = os.path.join(workdir, "spotify_songs.db")
+    library_db = os.path.join(workdir, "library.db")
+    index_dir = os.path.join(workdir, "knn_index")
+    results = {}
+    rng = np.random.default_rng(0)
+
+    df = load_catalog(csv_path)
+    tracks = load_tracks(csv_path)
+    track_ids = tracks.index.to_numpy()
+    basket = rng.choice(track_ids, size=min(10, len(track_ids)), replace=False)
+    ranges = {"tempo": (100.0, 130.0), "valence": (0.4, 0.8), "energy": (0.5, 1.0), "danceability": (0.5, 0.9)}
+
+    # Queries with less than 3 characters can't use the trigram index (LIKE on tracks_fts, search_short_*)
+    def search(column, query):
+        with connection(songs_db) as conn:
+            search_tracks(conn, column, query, ["track_id", "track_name", "track_artist"])
+
+    def save():
+        save_playlist("benchmark", "Benchmark", rng.choice(track_ids, size=min(50, len(track_ids)), replace=False),
+                      library_path=library_db, csv_path=csv_path)
+
+    def analytics():
+        # The summary is cached per library version, a new playlist makes the next read count again
+        save()
+        load_user_analytics("benchmark", library_db, csv_path)
+
+    def charts():
+        from charts import top_artists_chart, genre_chart, feature_histogram_chart
+        summary = load_user_analytics("benchmark", library_db, csv_path)
+        # Charts are cached per library version, new keys force the figures to be built
+        user_id = f"benchmark-{time.perf_counter_ns()}"
+        top_artists_chart(user_id, summary)
+        genre_chart(user_id, summary)
+        feature_histogram_chart(user_id, summary, "valence")
+
+    def knn_query():
+        knn = load_knn_index(csv_path, index_dir)
+        features = tracks.loc[basket, FEATURE_COLUMNS].to_numpy()
+        for mode in RECOMMENDATION_MODES:
+            recommend(knn, df, features, basket, 50, mode)
+
+    steps = {
+        "csv_load": (lambda: read_catalog(csv_path), len(df)),
+        "columnar_load": (lambda: read_columnar_catalog(csv_path, catalog_version(csv_path)), len(df)),
+        "db_ingest": (lambda: ingest_catalog(csv_path, songs_db, force=True), len(df)),
+        "search_short_artist": (lambda: search("track_artist", "ar"), 1),
+        "search_short_name": (lambda: search("track_name", "lo"), 1),
+        "search_fts_artist": (lambda: search("track_artist", "artist 1"), 1),
+        "search_fts_name": (lambda: search("track_name", "love"), 1),
+        "filter_index_build": (lambda: FeatureFilterIndex(df), len(tracks)),
+        "filter_estimate": (lambda: load_filter_index(csv_path).estimate(ranges), 1),
+        "filter_query": (lambda: load_filter_index(csv_path).query(ranges), 1),
+        "knn_fit": (lambda: build_knn_index(csv_path, index_dir), len(tracks)),
+        "knn_query": (knn_query, len(RECOMMENDATION_MODES)),
+        "playlist_save": (save, 1),
+        "viz_analytics": (analytics, 1),
+        "viz_charts": (charts, 3),
+    }
+    # Building the database and the index takes long, they are measured once
+    once = {"db_ingest", "knn_fit", "filter_index_build"}
+    warm_up = {"filter_estimate", "filter_query", "knn_query"}
+
+    for name in scenarios:
+        function, items = steps[name]
+        if name == "columnar_load":
+            ensure_columnar_catalog(csv_path)
+        if name.startswith("search") and "db_ingest" not in results and not os.path.exists(songs_db):
+            ingest_catalog(csv_path, songs_db)
+        if name == "knn_query" and "knn_fit" not in results:
+            build_knn_index(csv_path, index_dir)
+        # The first call loads or builds the cached index and maps it into memory (measured by knn_fit and
+        # filter_index_build), it is not part of a query and runs before the measurement
+        if name in warm_up:
+            function()
+        try:
+            durations = _measure(function, 1 if name in once else repeat)
+        except ImportError as error:
+            results[name] = {"skipped": str(error)}
+            continue
+        results[name] = _summary(durations, items)
+        print(f"{name:<20} median {results[name]['median_s']:.4f} s   p95 {results[name]['p95_s']:.4f} s", file=sys.stderr)
+    return results
+
+
+# Compares the results with absolute limits, e.g. {"30k": {"knn_query": {"max_p95_s": 0.2}}}
+# and optionally with the results of an earlier run (tolerance 0.25 = at most 25 % slower).
+# Returns a list of the violations.
+def check_results(report, thresholds=None, baseline=None, tolerance=0.25):
+    violations = []
+    limits = (thresholds or {}).get(report["size"], {})
+    for name, limit in limits.items():
+        result = report["scenarios"].get(name)
+        if result is None or "skipped" in result:
+            continue
+        if "max_p95_s" in limit and result["p95_s"] > limit["max_p95_s"]:
+            violations.append(f"{name}: p95 {result['p95_s']:.4f} s > {limit['max_p95_s']} s")
+        if "max_median_s" in limit and result["median_s"] > limit["max_median_s"]:
+            violations.append(f"{name}: median {result['median_s']:.4f} s > {limit['max_median_s']} s")
+        if "min_throughput_per_s" in limit and (result["throughput_per_s"] or 0) < limit["min_throughput_per_s"]:
+            violations.append(f"{name}: throughput {result['throughput_per_s']}/s < {limit['min_throughput_per_s']}/s")
+
+    if baseline is not None and baseline.get("size") == report["size"]:
+        for name, result in report["scenarios"].items():
+            previous = baseline["scenarios"].get(name)
+            if previous is None or "skipped" in result or "skipped" in previous:
+                continue
+            slower = result["median_s"] - previous["median_s"]
+            if result["median_s"] > previous["median_s"] * (1 + tolerance) and slower > MIN_REGRESSION_S:
+                violations.append(f"{name}: median {result['median_s']:.4f} s is more than {tolerance:.0%} "
+                                  f"slower than the baseline ({previous['median_s']:.4f} s)")
+    return violations
+
+
+def _environment():
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "pandas": pd.__version__}
+
+
+# Command line entry point:
+#   python benchmark.py --size 30k --output results.json --thresholds benchmark_thresholds.json
+#   python benchmark.py --size 1m --baseline results_main.json --tolerance 0.2
+# The exit code is 1 if a threshold or the baseline is violated, so the benchmark can gate a deployment.
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app with a synthetic catalog")
+    parser.add_argument("--size", choices=list(SIZES), default="30k", help="number of tracks of the synthetic catalog")
+    parser.add_argument("--csv", help="use this catalog instead of a synthetic one")
+    parser.add_argument("--workdir", help="directory for the catalog, databases and index (default: temporary)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated list of scenarios")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--generate-only", action="store_true", help="only write the synthetic catalog")
+    parser.add_argument("--output", help="write the results as JSON into this file (default: stdout)")
+    parser.add_argument("--thresholds", help="JSON file with the limits per size and scenario")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios {unknown}, choose from {SCENARIOS}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="trackfinder-benchmark-")
+    os.makedirs(workdir, exist_ok=True)
+    _use_own_columnar_dir(workdir)
+    try:
+        csv_path = args.csv
+        generate_s = None
+        if csv_path is None:
+            csv_path = os.path.join(workdir, f"catalog_{args.size}.csv")
+            start = time.perf_counter()
+            rows = generate_catalog(SIZES[args.size], csv_path, args.seed)
+            generate_s = round(time.perf_counter() - start, 3)
+            print(f"{rows} rows written to {csv_path} in {generate_s} s", file=sys.stderr)
+            if args.generate_only:
+                return
+
+        df = load_catalog(csv_path)
+        report = {
+            "size": args.size if args.csv is None else "custom",
+            "tracks": int(df["track_id"].nunique()),
+            "rows": len(df),
+            "generate_s": generate_s,
+            "environment": _environment(),
+            "scenarios": run_scenarios(csv_path, workdir, args.repeat, scenarios),
+        }
+    finally:
+        close_all()
+        if args.workdir is None and not args.generate_only:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    thresholds = None
+    if args.thresholds:
+        with open(args.thresholds) as file:
+            thresholds = json.load(file)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    report["violations"] = check_results(report, thresholds, baseline, args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    else:
+        print(output)
+    for violation in report["violations"]:
+        print(f"REGRESSION {violation}", file=sys.stderr)
+    sys.exit(1 if report["violations"] else 0)
+
+
+if __name__ == "__main__":
+    main()
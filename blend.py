@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from catalog import FEATURE_COLUMNS
+from features import to_metric_distances
+from tracing import traced
+
+#***************************************************************
+# Melody Match: songs for two playlists at once
+#***************************************************************
+
+# Modes of the blend with the label shown in the app
+BLEND_MODES = {
+    "intersection": "Songs that are close to both playlists",
+    "midpoint": "Songs between the two playlists",
+    "fair": "Songs that suit both playlists equally",
+}
+
+# Number of candidates per requested song, the candidates are the neighbours of all songs of both playlists
+CANDIDATE_FACTOR = 4
+
+# Weight of the difference of the two distances in the "fair" mode (0 = only the average distance counts)
+FAIRNESS_WEIGHT = 1.0
+
+
+# Function to calculate the distance of every candidate to the nearest song of a playlist
+# (candidates x songs in one matrix operation)
+def _nearest_distance(candidates, songs, space):
+    squared = ((candidates ** 2).sum(axis=1)[:, None] + (songs ** 2).sum(axis=1)[None, :]
+               - 2 * candidates @ songs.T)
+    distances = np.sqrt(np.maximum(squared, 0)).min(axis=1)
+    return to_metric_distances(distances, space)
+
+
+# Function to sort the candidates, best first
+def _rank_candidates(mode, distances_a, distances_b, distances_mid, in_both):
+    if mode == "intersection":
+        # Songs that are neighbours of both playlists come first, then the others.
+        # Within both groups the distance to the farther playlist decides.
+        return np.lexsort((np.maximum(distances_a, distances_b), ~in_both))
+    if mode == "midpoint":
+        return np.argsort(distances_mid, kind="stable")
+    scores = (distances_a + distances_b) / 2 + FAIRNESS_WEIGHT * np.abs(distances_a - distances_b)
+    return np.argsort(scores, kind="stable")
+
+
+# Finds n songs for two playlists with one batched query on the index.
+# features_a/features_b are the raw audio features of the songs of the playlists, exclude_track_ids the songs
+# of both playlists (they are not recommended again). progress(fraction, text) is called after every step.
+# Returns the catalog positions of the songs (best first) and the distances to both playlists.
+@traced("blend")
+def blend(knn, catalog_df, features_a, features_b, exclude_track_ids, n, mode="intersection", progress=None):
+    if mode not in BLEND_MODES:
+        raise ValueError(f"Mode must be one of {list(BLEND_MODES)}, not {mode!r}")
+    report = progress or (lambda fraction, text: None)
+
+    # 1. Both playlists in the scaled feature space, the midpoint of their averages
+    scaled_a, scaled_b = knn.transform(features_a), knn.transform(features_b)
+    midpoint = (scaled_a.mean(axis=0) + scaled_b.mean(axis=0)) / 2
+    if knn.space["metric"] == "cosine":
+        midpoint /= max(np.linalg.norm(midpoint), 1e-12)
+    report(0.25, "Audio features of both playlists compared")
+
+    # 2. One query for all songs of both playlists and the midpoint
+    points = np.vstack([scaled_a, scaled_b, midpoint[None, :]])
+    n_neighbors = n * CANDIDATE_FACTOR + len(points)
+    _, rows = knn.kneighbors_scaled(points, n_neighbors)
+    rows_a, rows_b = rows[:len(scaled_a)], rows[len(scaled_a):len(scaled_a) + len(scaled_b)]
+    report(0.5, "Candidates found")
+
+    # 3. Exact distances of every candidate to both playlists and to the midpoint
+    candidates = np.unique(rows)
+    candidates = candidates[~np.isin(catalog_df["track_id"].to_numpy()[candidates],
+                                     np.asarray(list(exclude_track_ids)))]
+    # The index keeps the catalog rows in ascending order, so the features of a row are found by a binary search
+    candidate_features = np.asarray(knn.features[np.searchsorted(knn.rows, candidates)], dtype=np.float32)
+    distances_a = _nearest_distance(candidate_features, scaled_a, knn.space)
+    distances_b = _nearest_distance(candidate_features, scaled_b, knn.space)
+    distances_mid = _nearest_distance(candidate_features, midpoint[None, :], knn.space)
+    in_both = np.isin(candidates, rows_a) & np.isin(candidates, rows_b)
+    report(0.75, "Distances calculated")
+
+    # 4. Best songs of the chosen mode
+    best = _rank_candidates(mode, distances_a, distances_b, distances_mid, in_both)[:n]
+    report(1.0, "Done")
+    return candidates[best], distances_a[best], distances_b[best]
+
+
+# Same as blend, but returns the catalog rows as dataframe with the distances to both playlists
+def blend_tracks(knn, catalog_df, tracks_a, tracks_b, n, mode="intersection", progress=None):
+    exclude = pd.concat([tracks_a["track_id"], tracks_b["track_id"]])
+    rows, distances_a, distances_b = blend(knn, catalog_df, tracks_a[FEATURE_COLUMNS].to_numpy(),
+                                           tracks_b[FEATURE_COLUMNS].to_numpy(), exclude, n, mode, progress)
+    songs = catalog_df.iloc[rows].copy()
+    songs["distance_1"] = np.round(distances_a, 4)
+    songs["distance_2"] = np.round(distances_b, 4)
+    return songs
@@ -0,0 +1,48 @@
+from catalog import CATALOG_CSV, load_tracks
+
+#***************************************************************
+# Basket of the "Find New Songs" page
+#***************************************************************
+
+
+# The basket only stores track ids (in the order they were added), the other columns are looked up in
+# the catalog when they are needed. Checking and adding/removing a song takes the same time for every size.
+class Cart:
+    def __init__(self, track_ids=()):
+        # dict keeps the insertion order, the values are not used
+        self._track_ids = dict.fromkeys(track_ids)
+
+    def __contains__(self, track_id):
+        return track_id in self._track_ids
+
+    def __len__(self):
+        return len(self._track_ids)
+
+    def __iter__(self):
+        return iter(list(self._track_ids))
+
+    def add(self, track_id):
+        self._track_ids[track_id] = None
+
+    def remove(self, track_id):
+        self._track_ids.pop(track_id, None)
+
+    def add_many(self, track_ids):
+        self._track_ids.update(dict.fromkeys(track_ids))
+
+    def remove_many(self, track_ids):
+        for track_id in track_ids:
+            self._track_ids.pop(track_id, None)
+
+    def clear(self):
+        self._track_ids.clear()
+
+    def track_ids(self):
+        return list(self._track_ids)
+
+
+# Returns the songs of the basket (in the order of the basket) with the given catalog columns
+def cart_tracks(cart, columns, csv_path=CATALOG_CSV):
+    tracks = load_tracks(csv_path)
+    track_ids = [track_id for track_id in cart.track_ids() if track_id in tracks.index]
+    return tracks.loc[track_ids, list(columns)].reset_index()
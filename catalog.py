@@ -0,0 +1,122 @@
+import os
+import hashlib
+import threading
+import pandas as pd
+from tracing import traced
+
+#***************************************************************
+# Shared catalog loader (spotify_songs.csv)
+#***************************************************************
+
+# Definition of the path of the actual script, the catalog lies next to it
+script_dir = os.path.dirname(os.path.abspath(__file__))
+CATALOG_CSV = os.path.join(script_dir, "spotify_songs.csv")
+
+# Audio features used by the nearest neighbour model and the filters
+FEATURE_COLUMNS = [
+    "danceability", "energy", "key", "loudness", "mode",
+    "speechiness", "acousticness", "instrumentalness", "liveness",
+    "valence", "tempo", "duration_ms"
+]
+
+# Columns with few distinct values (genres, artists) are stored as categories
+CATEGORY_COLUMNS = ["track_artist", "playlist_genre", "playlist_subgenre", "playlist_name"]
+
+# Explicit dtypes, so pandas does not have to guess them for every column
+CATALOG_DTYPES = {column: "float32" for column in FEATURE_COLUMNS}
+CATALOG_DTYPES.update({column: "category" for column in CATEGORY_COLUMNS})
+
+# Process-wide cache: path -> {"stat": (mtime, size), "hash": ..., "df": ..., "shared": ..., "tracks": ...}
+_catalog_cache = {}
+_catalog_lock = threading.Lock()
+
+
+# Function to read (mtime, size) of the csv-file, this is cheap and done on every call
+def _file_stat(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# Function to create a hash of the file content, only used if the mtime has changed
+@traced("catalog.hash")
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Function that parses the csv-file with the explicit dtypes
+@traced("catalog.parse")
+def read_catalog(path):
+    df = pd.read_csv(path, dtype=CATALOG_DTYPES)
+    return df
+
+
+# Function to load a catalog version: from the columnar copy shared by all processes if the ingestion
+# has published it (columnar.py), otherwise from the csv-file. Returns the dataframe and if it is shared.
+def _load_version(path, version):
+    from columnar import read_columnar_catalog
+    df = read_columnar_catalog(path, version)
+    if df is None:
+        return read_catalog(path), False
+    return df, True
+
+
+# Hand-off to the shared copy: a process that parsed the csv-file because the copy was not published yet
+# switches to it as soon as it is there. Its own dataframe is freed when no session uses it anymore.
+def _attach_shared(path, cached):
+    from columnar import columnar_exists, read_columnar_catalog
+    if columnar_exists(path, cached["hash"]):
+        df = read_columnar_catalog(path, cached["hash"])
+        if df is not None:
+            cached.update(df=df, shared=True)
+            cached.pop("tracks", None)
+
+
+# Returns the catalog as one shared dataframe. The catalog is only loaded once per process and
+# again when the mtime of the csv-file changed and the content hash is different. The dataframe is shared between
+# all sessions and pages, it must be treated as read-only (use .copy() before changing it).
+def load_catalog(path=CATALOG_CSV):
+    stat = _file_stat(path)
+    with _catalog_lock:
+        cached = _catalog_cache.get(path)
+        if cached is not None and cached["stat"] == stat:
+            if not cached["shared"]:
+                _attach_shared(path, cached)
+            return cached["df"]
+
+        content_hash = file_hash(path)
+        if cached is not None and cached["hash"] == content_hash:
+            # File was only touched, the content is the same
+            cached["stat"] = stat
+            return cached["df"]
+
+        df, shared = _load_version(path, content_hash)
+        _catalog_cache[path] = {"stat": stat, "hash": content_hash, "df": df, "shared": shared}
+        return df
+
+
+# Returns the content hash of the loaded catalog, it is used as version of the catalog
+def catalog_version(path=CATALOG_CSV):
+    load_catalog(path)
+    return _catalog_cache[path]["hash"]
+
+
+# Returns the catalog with one row per track, indexed by track_id (a track is listed once per playlist
+# in the csv-file). It is created once per catalog version and shared like the catalog itself,
+# with the columnar copy it is mapped from the published tracks.
+def load_tracks(path=CATALOG_CSV):
+    load_catalog(path)
+    with _catalog_lock:
+        cached = _catalog_cache[path]
+        if "tracks" not in cached:
+            tracks = None
+            if cached["shared"]:
+                from columnar import read_columnar_tracks
+                tracks = read_columnar_tracks(path, cached["hash"])
+            if tracks is None:
+                tracks = cached["df"].drop_duplicates("track_id").set_index("track_id")
+            cached["tracks"] = tracks
+        return cached["tracks"]
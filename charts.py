@@ -0,0 +1,100 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import plotly.graph_objects as go
+from tracing import span
+
+#***************************************************************
+# Charts of the visualizations (plotly, drawn in the browser)
+#***************************************************************
+
+# The figures are built from the precomputed statistics (analytics.py), no songs are read here.
+# A figure only depends on the user, the chart and the version of the user's library, so it is
+# built once and reused: (user_id, chart) -> (key, figure)
+_chart_cache = OrderedDict()
+_chart_lock = threading.Lock()
+
+# Figures kept in the cache, the least recently used figure is dropped first
+MAX_CACHED_CHARTS = 300
+
+# Height of all charts (pixels)
+CHART_HEIGHT = 450
+
+
+# Function to return the cached figure or build it with build(*args)
+def _cached_chart(user_id, chart, key, build, *args):
+    with _chart_lock:
+        cached = _chart_cache.get((user_id, chart))
+        if cached is not None and cached[0] == key:
+            _chart_cache.move_to_end((user_id, chart))
+            return cached[1]
+    with span(f"chart.{chart}"):
+        figure = build(*args)
+    with _chart_lock:
+        _chart_cache[(user_id, chart)] = (key, figure)
+        _chart_cache.move_to_end((user_id, chart))
+        while len(_chart_cache) > MAX_CACHED_CHARTS:
+            _chart_cache.popitem(last=False)
+    return figure
+
+
+def _layout(figure, title, x_title, y_title):
+    figure.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title, height=CHART_HEIGHT,
+                         margin=dict(l=10, r=10, t=50, b=10))
+    return figure
+
+
+# Horizontal bars of the top artists (most songs on top)
+def _top_artists_figure(top_artists):
+    figure = go.Figure(go.Bar(x=top_artists.values, y=top_artists.index.astype(str), orientation="h",
+                              marker_color="steelblue"))
+    figure.update_yaxes(autorange="reversed")
+    return _layout(figure, "Top 10 Artists", "Number of songs", "Artists")
+
+
+def _genre_figure(genre_counts):
+    figure = go.Figure(go.Bar(x=genre_counts.index.astype(str), y=genre_counts.values, marker_color="skyblue"))
+    return _layout(figure, "Distribution of Genres", "Genre", "Number")
+
+
+# Bars of a histogram with its bin edges
+def _histogram_figure(feature, counts, edges):
+    centers = (edges[:-1] + edges[1:]) / 2
+    figure = go.Figure(go.Bar(x=centers, y=counts, width=np.diff(edges), marker_color="green",
+                              marker_line_color="white", marker_line_width=1))
+    return _layout(figure, f"Distribution {feature}", feature.capitalize(), "Anzahl")
+
+
+# Returns the chart of the top artists of a user. summary is the result of library.load_user_analytics.
+def top_artists_chart(user_id, summary, top=10):
+    return _cached_chart(user_id, "top_artists", (summary["version"], top),
+                         _top_artists_figure, summary["artists"].head(top))
+
+
+def genre_chart(user_id, summary):
+    return _cached_chart(user_id, "genres", summary["version"], _genre_figure, summary["genres"])
+
+
+# Share (percent) of the songs of the user and of all songs in every bin, drawn over each other
+def _comparison_figure(feature, counts, catalog_counts, edges):
+    centers = (edges[:-1] + edges[1:]) / 2
+    figure = go.Figure()
+    for name, values, color in [("All songs", catalog_counts, "lightgray"), ("Your songs", counts, "green")]:
+        share = 100 * values / max(values.sum(), 1)
+        figure.add_trace(go.Bar(x=centers, y=share, width=np.diff(edges), name=name, marker_color=color, opacity=0.7))
+    figure.update_layout(barmode="overlay")
+    return _layout(figure, f"Distribution {feature}: your songs and all songs", feature.capitalize(), "Share of songs (%)")
+
+
+# Returns the histogram of a feature of the user's songs. With catalog_histograms (analytics.catalog_histograms)
+# the distribution of all songs is shown as well.
+def feature_histogram_chart(user_id, summary, feature, catalog_histograms=None):
+    counts, edges = summary["histograms"][feature]
+    if catalog_histograms is None:
+        return _cached_chart(user_id, "histogram", (summary["version"], feature),
+                             _histogram_figure, feature, counts, edges)
+    catalog_counts, catalog_edges = catalog_histograms[feature]
+    if not np.allclose(edges, catalog_edges):
+        raise ValueError(f"The histograms of {feature} have different bins, run python ingest.py --force")
+    return _cached_chart(user_id, "comparison", (summary["version"], feature),
+                         _comparison_figure, feature, counts, catalog_counts, edges)
@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+from catalog import CATALOG_CSV, FEATURE_COLUMNS, load_catalog, load_tracks, catalog_version
+from tracing import traced
+
+#***************************************************************
+# Columnar copy of the catalog, shared by all server processes
+#***************************************************************
+
+# The copy is written once per catalog version and every server process maps the same files, so the
+# catalog is held once per machine (in the page cache) instead of once per process:
+#   metadata.arrow  all columns except the audio features (Arrow IPC, uncompressed). The strings are used
+#                   where they lie in the mapped file, the category columns are dictionary encoded.
+#   features.npy    the twelve audio features as one float32 matrix in column-major order, so every
+#                   feature column of the dataframe is a contiguous view into the mapped file
+#   tracks.arrow    one row per track (load_tracks), with the audio features
+#   meta.json       version, column order and number of rows, written last
+
+logger = logging.getLogger(__name__)
+
+# Directory of the copies, by default next to the csv-file. CATALOG_SHARED_DIR=/dev/shm/trackfinder keeps
+# them in shared memory (RAM) instead of on disk.
+SHARED_DIR = os.environ.get("CATALOG_SHARED_DIR")
+COLUMNAR_DIRNAME = "catalog_columnar"
+
+# Versions kept in the directory: processes that have not noticed the new version yet still find the previous one
+KEEP_VERSIONS = 2
+
+# A process that publishes a version holds a lock file, after this many seconds the lock is stale (crashed process)
+PUBLISH_TIMEOUT = 15 * 60
+
+
+def columnar_dir(csv_path=CATALOG_CSV):
+    return SHARED_DIR or os.path.join(os.path.dirname(os.path.abspath(csv_path)), COLUMNAR_DIRNAME)
+
+
+def _version_dir(csv_path, version):
+    return os.path.join(columnar_dir(csv_path), version)
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# True if the copy of the version is complete (meta.json is the last file of a copy)
+def columnar_exists(csv_path, version):
+    return os.path.exists(os.path.join(_version_dir(csv_path, version), "meta.json"))
+
+
+def _write_arrow(df, path):
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with ipc.new_file(path, table.schema) as writer:
+        writer.write_table(table)
+
+
+# Function to map an Arrow file, the columns of the dataframe point into the mapped file
+def _read_arrow(path):
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    # split_blocks: numeric columns are not copied into one block per dtype
+    return ipc.open_file(pa.memory_map(path)).read_all().to_pandas(split_blocks=True)
+
+
+# Lock for the publishing of a version, so several processes that see a new catalog at the same time
+# do not all write it. Returns the path of the lock file, or None if another process holds the lock.
+def _acquire_publish_lock(base_dir, version):
+    lock_path = os.path.join(base_dir, f".publishing-{version}")
+    try:
+        if time.time() - os.path.getmtime(lock_path) > PUBLISH_TIMEOUT:
+            os.remove(lock_path)
+    except OSError:
+        pass
+    try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return None
+    return lock_path
+
+
+# Function to remove all but the newest KEEP_VERSIONS copies. Processes that still map files
+# of a removed copy keep them until they unmap them.
+def _remove_old_versions(base_dir):
+    versions = [entry for entry in os.scandir(base_dir) if entry.is_dir() and not entry.name.startswith(".")]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[KEEP_VERSIONS:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+# Writes the copy of a catalog version into a temporary directory and renames it to <version>/ when it is complete.
+# Returns the directory, or None if pyarrow is not installed or another process is publishing the version.
+@traced("catalog.columnar_write")
+def write_columnar_catalog(df, tracks, csv_path, version):
+    if not _has_pyarrow():
+        logger.warning("pyarrow is not installed, the columnar catalog is not written")
+        return None
+    base_dir = columnar_dir(csv_path)
+    os.makedirs(base_dir, exist_ok=True)
+    lock_path = _acquire_publish_lock(base_dir, version)
+    if lock_path is None:
+        return None
+    target_dir = _version_dir(csv_path, version)
+    build_dir = tempfile.mkdtemp(dir=base_dir, prefix=".build-")
+    try:
+        os.chmod(build_dir, 0o755)
+        _write_arrow(df[[column for column in df.columns if column not in FEATURE_COLUMNS]],
+                     os.path.join(build_dir, "metadata.arrow"))
+        np.save(os.path.join(build_dir, "features.npy"), np.asfortranarray(df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)))
+        _write_arrow(tracks.reset_index(), os.path.join(build_dir, "tracks.arrow"))
+        with open(os.path.join(build_dir, "meta.json"), "w") as file:
+            json.dump({"version": version, "columns": list(df.columns), "rows": len(df), "tracks": len(tracks)}, file)
+        if os.path.exists(target_dir):
+            shutil.rmtree(target_dir)
+        os.replace(build_dir, target_dir)
+        _remove_old_versions(base_dir)
+    except Exception:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    finally:
+        os.remove(lock_path)
+    return target_dir
+
+
+# Maps the copy of a catalog version, returns None if it was not written (yet).
+# The files are read lazily by the OS, pages that are already in memory are shared with the other processes.
+@traced("catalog.columnar_read")
+def read_columnar_catalog(csv_path, version):
+    version_dir = _version_dir(csv_path, version)
+    if not columnar_exists(csv_path, version) or not _has_pyarrow():
+        return None
+    try:
+        with open(os.path.join(version_dir, "meta.json")) as file:
+            meta = json.load(file)
+        metadata = _read_arrow(os.path.join(version_dir, "metadata.arrow"))
+        features = np.load(os.path.join(version_dir, "features.npy"), mmap_mode="r")
+    except OSError:
+        # The version was removed in the meantime (two newer versions were published)
+        return None
+    df = pd.concat([metadata, pd.DataFrame(features, columns=FEATURE_COLUMNS, copy=False)], axis=1)
+    return df[meta["columns"]]
+
+
+# Maps the tracks of a catalog version (one row per track, indexed by track_id), None if they were not written
+@traced("catalog.columnar_tracks")
+def read_columnar_tracks(csv_path, version):
+    path = os.path.join(_version_dir(csv_path, version), "tracks.arrow")
+    if not _has_pyarrow():
+        return None
+    try:
+        return _read_arrow(path).set_index("track_id")
+    except OSError:
+        return None
+
+
+# Writes the columnar copy of the current catalog version if it does not exist yet (called by the ingestion).
+# Returns True if it was written by this call.
+def ensure_columnar_catalog(csv_path=CATALOG_CSV, force=False):
+    version = catalog_version(csv_path)
+    if not force and columnar_exists(csv_path, version):
+        return False
+    return write_columnar_catalog(load_catalog(csv_path), load_tracks(csv_path), csv_path, version) is not None
@@ -0,0 +1,214 @@
+import time
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from tracing import TRACING, record_span, sql_aggregate, sql_text
+
+#***************************************************************
+# Connection pool for all SQLite databases of the app
+#***************************************************************
+
+# Number of idle connections kept open per database file
+POOL_SIZE = 8
+
+# Size of the memory-mapped part of the database file (bytes)
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Number of prepared statements every connection keeps (they are reused by the long-lived connections)
+CACHED_STATEMENTS = 256
+
+# Waiting time (seconds) if another connection holds the write lock
+BUSY_TIMEOUT = 30
+
+# Rows fetched at once when a traced cursor is iterated
+FETCH_SIZE = 256
+
+# One pool per database file: path -> ConnectionPool
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# Cursor that measures every statement as span "sql" with its text and number of rows (tracing.py).
+# The time to fetch the rows is part of the span, the time the caller spends between two fetches is not.
+# The span is recorded when all rows are fetched, the next statement is executed or the cursor is closed.
+class TracedCursor(sqlite3.Cursor):
+    _trace = None
+
+    def _finish(self):
+        trace, self._trace = self._trace, None
+        if trace is not None:
+            statement, duration, rows = trace
+            if self.description is None:
+                rows = max(self.rowcount, 0)
+            record_span("sql", duration, {"sql": sql_text(statement), "rows": rows}, aggregate=sql_aggregate(statement))
+
+    def _fetched(self, start, rows, done):
+        if self._trace is not None:
+            self._trace[1] += time.perf_counter() - start
+            self._trace[2] += rows
+            if done:
+                self._finish()
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        if not TRACING:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._trace = [sql, time.perf_counter() - start, 0]
+        if self.description is None:
+            # No rows to fetch (INSERT, UPDATE, CREATE, ...)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        if not TRACING:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._trace = [sql, time.perf_counter() - start, 0]
+        self._finish()
+        return self
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    # Cursors of conn.execute(...).fetchone() are only dropped, the span is recorded then
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+# Connection whose cursors are traced (pd.read_sql_query creates its cursors with cursor())
+class TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# Opens a connection with traced cursors, for connections outside of the pool (e.g. ingest.py)
+def connect(path, **kwargs):
+    return sqlite3.connect(path, factory=TracedConnection, **kwargs)
+
+
+# Function to open and configure a new connection. WAL mode lets readers work while another
+# session writes, check_same_thread=False is needed because the pool hands connections to different threads.
+def _open_connection(path):
+    conn = connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# Pool of connections to one database file. A connection is only used by one thread at a time.
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return _open_connection(self.path)
+
+    def release(self, conn):
+        # Open transactions are never handed to the next user of the connection
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self.idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def get_pool(path):
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = ConnectionPool(path)
+        return _pools[path]
+
+
+# Borrows a connection from the pool of the database file:
+#     with connection(path) as conn:
+#         ...
+# The changes are committed at the end of the block (rolled back after an error)
+# and the connection always goes back to the pool, also after an early return.
+@contextmanager
+def connection(path):
+    pool = get_pool(path)
+    conn = pool.acquire()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        pool.release(conn)
+
+
+# Closes all idle connections (e.g. before a database file is replaced)
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+
+
+# Function to translate a pandas dtype into a SQLite column type
+def sql_type(dtype):
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+# Function to turn the dataframe into rows of python values (None instead of NaN) for executemany
+def to_rows(df):
+    columns = [df[column].astype(object).where(df[column].notna(), None).tolist() for column in df.columns]
+    return list(zip(*columns))
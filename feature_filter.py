@@ -0,0 +1,156 @@
+import threading
+import numpy as np
+from catalog import CATALOG_CSV, FEATURE_COLUMNS, load_catalog, catalog_version
+from tracing import traced
+
+#***************************************************************
+# Filtering of the catalog by ranges of audio features
+#***************************************************************
+
+# Audio features that can be filtered (all features of the nearest neighbour model)
+FILTER_COLUMNS = list(FEATURE_COLUMNS)
+
+# Features of the small cube of binned counts, the other features are estimated with their own histogram
+CUBE_COLUMNS = ["tempo", "valence", "energy", "danceability"]
+CUBE_BINS = 8
+
+# Number of bins of the histogram of every feature
+HISTOGRAM_BINS = 32
+
+# Number of songs shown per page
+PAGE_SIZE = 100
+
+# Filter indexes that are already built in this process: version -> FeatureFilterIndex
+_filter_indexes = {}
+_filter_lock = threading.Lock()
+
+
+# Function to calculate which part (0 to 1) of every bin lies within [low, high]
+def _bin_coverage(edges, low, high):
+    widths = np.maximum(edges[1:] - edges[:-1], 1e-12)
+    overlap = np.minimum(high, edges[1:]) - np.maximum(low, edges[:-1])
+    coverage = np.clip(overlap / widths, 0.0, 1.0)
+    # Bins without width (constant feature) count fully if their value is within the range
+    constant = edges[1:] == edges[:-1]
+    coverage[constant] = (low <= edges[:-1][constant]) & (edges[:-1][constant] <= high)
+    return coverage
+
+
+# Columnar index of the catalog: every feature is kept sorted (with the catalog row of every value),
+# so the songs within a range are found with a binary search instead of a scan of the whole catalog.
+# Histograms of every feature and a cube of binned counts give a fast estimate of the number of songs.
+class FeatureFilterIndex:
+    @traced("filter.build")
+    def __init__(self, df, columns=FILTER_COLUMNS):
+        # One row per track, like SELECT DISTINCT on the shown columns
+        self.rows = np.flatnonzero(~df["track_id"].duplicated().to_numpy())
+        self.values = {}
+        self.order = {}
+        self.sorted_values = {}
+        self.histograms = {}
+        self.discrete = set()
+        for column in columns:
+            values = df[column].to_numpy(dtype=np.float32)[self.rows]
+            order = np.argsort(values, kind="stable")
+            self.values[column] = values
+            self.order[column] = order
+            self.sorted_values[column] = values[order]
+            self.histograms[column] = np.histogram(values, bins=self._histogram_bins(column, values))
+
+        cube_columns = [column for column in CUBE_COLUMNS if column in columns]
+        self.cube, cube_edges = np.histogramdd(np.column_stack([self.values[column] for column in cube_columns]),
+                                               bins=CUBE_BINS)
+        self.cube_edges = dict(zip(cube_columns, cube_edges))
+
+    # Function to choose the bins of a histogram. Features with few whole-number values (key, mode)
+    # get one bin per value, so a range like (1, 1) is estimated correctly.
+    def _histogram_bins(self, column, values):
+        if len(values) and np.all(values == np.round(values)) and values.max() - values.min() <= HISTOGRAM_BINS:
+            self.discrete.add(column)
+            return np.arange(values.min() - 0.5, values.max() + 1.5)
+        return HISTOGRAM_BINS
+
+    # Smallest and largest value of a feature
+    def bounds(self, column):
+        sorted_values = self.sorted_values[column]
+        return float(sorted_values[0]), float(sorted_values[-1])
+
+    # Estimates the number of songs within the ranges without looking at the songs: the cube gives the
+    # count for its features, the histograms of the other features reduce it (as if they were independent).
+    def estimate(self, ranges):
+        if not ranges:
+            return len(self.rows)
+        coverages = []
+        for column, edges in self.cube_edges.items():
+            low, high = ranges.get(column, (-np.inf, np.inf))
+            coverages.append(_bin_coverage(edges, low, high))
+        estimate = self.cube
+        for coverage in coverages:
+            # Contract the first axis of the cube with the coverage of its bins
+            estimate = np.tensordot(coverage, estimate, axes=(0, 0))
+        estimate = float(estimate)
+
+        for column, (low, high) in ranges.items():
+            if column not in self.cube_edges:
+                counts, edges = self.histograms[column]
+                if column in self.discrete:
+                    low, high = low - 0.5, high + 0.5
+                estimate *= float(counts @ _bin_coverage(edges, low, high)) / len(self.rows)
+        return int(round(estimate))
+
+    # Function to find the part of the sorted column that lies within [low, high]
+    def _bounds(self, column, low, high):
+        sorted_values = self.sorted_values[column]
+        return (np.searchsorted(sorted_values, np.float32(low), side="left"),
+                np.searchsorted(sorted_values, np.float32(high), side="right"))
+
+    # Returns the positions (in self.rows) of all songs within all ranges, in catalog order.
+    # ranges: {column: (low, high)}
+    def matching(self, ranges):
+        if not ranges:
+            return np.arange(len(self.rows))
+        bounds = {column: self._bounds(column, low, high) for column, (low, high) in ranges.items()}
+
+        # The range with the fewest songs is taken from the index, the other ranges are only checked for these songs
+        column = min(bounds, key=lambda name: bounds[name][1] - bounds[name][0])
+        start, end = bounds[column]
+        candidates = self.order[column][start:end]
+        for other, (low, high) in ranges.items():
+            if other != column and len(candidates):
+                values = self.values[other][candidates]
+                candidates = candidates[(values >= np.float32(low)) & (values <= np.float32(high))]
+        return np.sort(candidates)
+
+    # Returns the catalog positions of one page of matching songs and the total number of matches
+    @traced("filter.query")
+    def query(self, ranges, page=1, page_size=PAGE_SIZE):
+        matches = self.matching(ranges)
+        start = (page - 1) * page_size
+        return self.rows[matches[start:start + page_size]], len(matches)
+
+
+# Returns the filter index of the current catalog version (built once per process and version)
+def load_filter_index(csv_path=CATALOG_CSV):
+    version = catalog_version(csv_path)
+    with _filter_lock:
+        if version not in _filter_indexes:
+            _filter_indexes.clear()
+            _filter_indexes[version] = FeatureFilterIndex(load_catalog(csv_path))
+        return _filter_indexes[version]
+
+
+# Returns the estimated number of songs within the ranges (no scan, used while the sliders are moved)
+def estimate_count(ranges, csv_path=CATALOG_CSV):
+    return load_filter_index(csv_path).estimate(ranges)
+
+
+# Returns the smallest and largest value of every filterable feature: {column: (low, high)}
+def feature_bounds(csv_path=CATALOG_CSV):
+    filter_index = load_filter_index(csv_path)
+    return {column: filter_index.bounds(column) for column in FILTER_COLUMNS}
+
+
+# Returns one page of songs within the ranges (catalog rows, only the given columns) and the total number of songs
+def filter_tracks(ranges, columns, page=1, page_size=PAGE_SIZE, csv_path=CATALOG_CSV):
+    rows, total = load_filter_index(csv_path).query(ranges, page, page_size)
+    return load_catalog(csv_path).iloc[rows][columns].reset_index(drop=True), total
@@ -0,0 +1,84 @@
+import json
+import hashlib
+import numpy as np
+from catalog import FEATURE_COLUMNS
+
+#***************************************************************
+# Feature space of the recommender (scaling, weights, distance)
+#***************************************************************
+
+# Without scaling duration_ms and tempo (large numbers) decide alone which songs are similar.
+# Every feature is therefore scaled with values fitted on the whole catalog.
+SCALING_METHODS = ["zscore", "minmax"]
+METRICS = ["euclidean", "cosine"]
+
+# Weight per feature after scaling, a higher weight makes the feature more important for the similarity
+DEFAULT_WEIGHTS = {column: 1.0 for column in FEATURE_COLUMNS}
+DEFAULT_WEIGHTS.update({"key": 0.5, "mode": 0.5, "duration_ms": 0.5})
+
+
+# Creates the feature space for a catalog feature matrix (rows = songs, columns = FEATURE_COLUMNS).
+# The result is a plain dict so it can be stored as json next to the index.
+def fit_feature_space(raw_features, method="zscore", weights=None, metric="euclidean"):
+    if method not in SCALING_METHODS:
+        raise ValueError(f"Scaling method must be one of {SCALING_METHODS}, not {method!r}")
+    if metric not in METRICS:
+        raise ValueError(f"Metric must be one of {METRICS}, not {metric!r}")
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+
+    raw_features = np.asarray(raw_features, dtype=np.float64)
+    if method == "zscore":
+        offset = raw_features.mean(axis=0)
+        scale = raw_features.std(axis=0)
+    else:
+        offset = raw_features.min(axis=0)
+        scale = raw_features.max(axis=0) - offset
+    # Constant features would lead to a division by zero
+    scale[scale == 0] = 1.0
+
+    return {
+        "columns": list(FEATURE_COLUMNS),
+        "method": method,
+        "metric": metric,
+        "offset": offset.tolist(),
+        "scale": scale.tolist(),
+        "weights": [float(weights[column]) for column in FEATURE_COLUMNS],
+    }
+
+
+# Short id of the settings (not the fitted values), used in the directory name of the index
+def feature_space_id(method="zscore", weights=None, metric="euclidean"):
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    settings = json.dumps([method, metric, [weights[column] for column in FEATURE_COLUMNS]])
+    return hashlib.sha1(settings.encode()).hexdigest()[:8]
+
+
+# Transforms raw audio features into the feature space (float32). For the cosine metric the rows
+# are normalized to length 1, then the euclidean distance has the same order as the cosine distance.
+def transform_features(raw_features, space):
+    features = np.asarray(raw_features, dtype=np.float32)
+    offset = np.asarray(space["offset"], dtype=np.float32)
+    factor = np.asarray(space["weights"], dtype=np.float32) / np.asarray(space["scale"], dtype=np.float32)
+    features = (features - offset) * factor
+    if space["metric"] == "cosine":
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        features = features / norms
+    return np.ascontiguousarray(features, dtype=np.float32)
+
+
+# Converts the euclidean distances of the index back into distances of the chosen metric
+def to_metric_distances(distances, space):
+    if space["metric"] == "cosine":
+        return distances ** 2 / 2
+    return distances
+
+
+def save_feature_space(space, path):
+    with open(path, "w") as file:
+        json.dump(space, file)
+
+
+def load_feature_space(path):
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,242 @@
+import os
+import argparse
+import threading
+from datetime import datetime
+import pandas as pd
+from db import connect, sql_type, to_rows
+from catalog import CATALOG_CSV, load_tracks, catalog_version, script_dir
+from analytics import feature_edges, bin_counts
+from columnar import ensure_columnar_catalog
+from tracing import traced
+
+#***************************************************************
+# Versioned ingestion of the catalog into spotify_songs.db
+#***************************************************************
+
+SONGS_DB = os.path.join(script_dir, "spotify_songs.db")
+
+# A track can appear in several playlists of the dataset, so a row is identified by track and playlist
+TRACK_KEY_COLUMNS = ["track_id", "playlist_id"]
+
+# Version of the database layout, increase it when the tables or indexes built here change
+SCHEMA_VERSION = "5"
+
+# Audio features with whole numbers, stored as INTEGER (the csv-file can write them as 5.0)
+INTEGER_COLUMNS = ["key", "mode"]
+
+# Versions that were already checked in this process: db path -> catalog version
+_ingested_versions = {}
+_ingest_lock = threading.Lock()
+
+
+# Function to create the fingerprint table, it stores the version of the csv-file the database was built from
+def _create_meta_table(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+
+def get_meta(conn, key):
+    _create_meta_table(conn)
+    row = conn.execute("SELECT value FROM catalog_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_meta(conn, key, value):
+    conn.execute("INSERT INTO catalog_meta (key, value) VALUES (?, ?) "
+                 "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+
+# Function to create the songs table (schema from the dataframe) and the unique key for the upsert
+def _create_songs_table(conn, df):
+    column_defs = ", ".join(f'"{column}" {sql_type(dtype)}' for column, dtype in df.dtypes.items())
+    conn.execute(f"CREATE TABLE IF NOT EXISTS spotify_songs ({column_defs})")
+    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_spotify_songs_key ON spotify_songs ({', '.join(TRACK_KEY_COLUMNS)})")
+
+
+# Columns of the full-text search index (used by the search pages)
+SEARCH_COLUMNS = ["track_name", "track_artist", "playlist_genre"]
+
+
+# Function to create the FTS5 search index with one row per track (a track is listed once per playlist in
+# spotify_songs). The rowid of a row is the rowid of the first spotify_songs row of the track, playlist_genre
+# holds the genres of all playlists of the track. The index is kept up to date by _update_search_index.
+def _create_search_index(conn):
+    # Index of older versions: one row per playlist entry, maintained by triggers
+    for trigger in ["insert", "delete", "update"]:
+        conn.execute(f"DROP TRIGGER IF EXISTS spotify_songs_fts_{trigger}")
+    conn.execute("DROP TABLE IF EXISTS spotify_songs_fts")
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS search_changed (track_id TEXT PRIMARY KEY)")
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'tracks_fts'").fetchone()
+    if exists:
+        return
+    # trigram tokenizer: a search for a part of a word (like LIKE '%q%') can use the index
+    conn.execute(f"""CREATE VIRTUAL TABLE tracks_fts USING fts5(
+        {", ".join(SEARCH_COLUMNS)}, track_id UNINDEXED, tokenize='trigram')""")
+    # A new index gets the tracks that are already in the table
+    conn.execute("INSERT OR IGNORE INTO temp.search_changed (track_id) SELECT track_id FROM spotify_songs")
+
+
+# Function to write the search rows of the tracks in temp.search_changed again (after they were inserted,
+# updated or deleted in spotify_songs). Only these tracks are touched, not the whole index.
+def _update_search_index(conn):
+    conn.execute("DELETE FROM tracks_fts WHERE track_id IN (SELECT track_id FROM temp.search_changed)")
+    # MIN(rowid): the other columns are taken from the first row of the track
+    conn.execute("""
+        INSERT INTO tracks_fts (rowid, track_name, track_artist, playlist_genre, track_id)
+        SELECT MIN(rowid), track_name, track_artist, group_concat(DISTINCT playlist_genre), track_id
+        FROM spotify_songs WHERE track_id IN (SELECT track_id FROM temp.search_changed)
+        GROUP BY track_id
+    """)
+    conn.execute("DELETE FROM temp.search_changed")
+
+
+# Function to parse the csv-file for the database. The shared catalog (load_catalog) holds the audio features
+# as float32, the database gets the values of the csv-file (0.748 instead of 0.7480000257492065).
+def _read_catalog_for_db(csv_path):
+    df = pd.read_csv(csv_path)
+    for column in INTEGER_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("Int64")
+    return df
+
+
+# Function to write the histogram of every audio feature over all tracks (one row per track), the distribution
+# view compares the songs of a user with it. The bins are the same as the bins of the user statistics (analytics.py).
+def _write_feature_histograms(conn, csv_path):
+    conn.execute("""CREATE TABLE IF NOT EXISTS feature_histograms (
+        feature TEXT NOT NULL, bin INTEGER NOT NULL, low REAL NOT NULL, high REAL NOT NULL, count INTEGER NOT NULL,
+        PRIMARY KEY (feature, bin))""")
+    conn.execute("DELETE FROM feature_histograms")
+    tracks = load_tracks(csv_path)
+    rows = []
+    for feature, edges in feature_edges(csv_path).items():
+        counts = bin_counts(tracks[feature].to_numpy(dtype="float64"), edges)
+        rows.extend((feature, bin, float(edges[bin]), float(edges[bin + 1]), int(count)) for bin, count in enumerate(counts))
+    conn.executemany("INSERT INTO feature_histograms (feature, bin, low, high, count) VALUES (?, ?, ?, ?, ?)", rows)
+
+
+# Function to write the new tracks into a temporary staging table
+def _fill_staging_table(conn, df):
+    conn.execute("DROP TABLE IF EXISTS temp.spotify_songs_staging")
+    conn.execute(f"CREATE TEMP TABLE spotify_songs_staging AS SELECT {', '.join(df.columns)} FROM spotify_songs WHERE 0")
+    placeholders = ", ".join("?" for _ in df.columns)
+    conn.executemany(f"INSERT INTO spotify_songs_staging VALUES ({placeholders})", to_rows(df))
+    # Without the index every row of the catalog scans the whole staging table in _delete_removed_tracks
+    conn.execute(f"CREATE INDEX temp.spotify_songs_staging_key ON spotify_songs_staging ({', '.join(TRACK_KEY_COLUMNS)})")
+
+
+# Inserts new tracks and updates existing ones (keyed on track_id/playlist_id), other rows are not touched.
+# Can be used for incremental updates of the catalog, the caller commits. Returns the number of rows in tracks_df.
+def upsert_tracks(conn, tracks_df):
+    _create_songs_table(conn, tracks_df)
+    _create_search_index(conn)
+    _fill_staging_table(conn, tracks_df)
+
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(spotify_songs)")]
+    columns = [column for column in columns if column in tracks_df.columns]
+    column_list = ", ".join(columns)
+    value_columns = [column for column in columns if column not in TRACK_KEY_COLUMNS]
+    updates = ", ".join(f"{column} = excluded.{column}" for column in value_columns)
+    # Only rows with a changed value are written again, unchanged rows are not touched
+    changed_values = " OR ".join(f"spotify_songs.{column} IS NOT excluded.{column}" for column in value_columns)
+
+    # Tracks whose search columns change (or that are new) get new rows in the search index
+    changed = " OR ".join(f"s.{column} IS NOT st.{column}" for column in SEARCH_COLUMNS)
+    conn.execute(f"""
+        INSERT OR IGNORE INTO temp.search_changed (track_id)
+        SELECT st.track_id FROM spotify_songs_staging st
+        LEFT JOIN spotify_songs s ON s.track_id = st.track_id AND s.playlist_id = st.playlist_id
+        WHERE s.rowid IS NULL OR {changed}
+    """)
+    conn.execute(f"""
+        INSERT INTO spotify_songs ({column_list})
+        SELECT {column_list} FROM spotify_songs_staging WHERE true
+        ON CONFLICT({', '.join(TRACK_KEY_COLUMNS)}) DO UPDATE SET {updates} WHERE {changed_values}
+    """)
+    _update_search_index(conn)
+    return len(tracks_df)
+
+
+# Deletes the tracks that are no longer in the staging table (= no longer in the csv-file)
+def _delete_removed_tracks(conn):
+    removed = """NOT EXISTS (
+            SELECT 1 FROM spotify_songs_staging s
+            WHERE s.track_id = spotify_songs.track_id AND s.playlist_id = spotify_songs.playlist_id)"""
+    conn.execute(f"INSERT OR IGNORE INTO temp.search_changed (track_id) SELECT track_id FROM spotify_songs WHERE {removed}")
+    cursor = conn.execute(f"DELETE FROM spotify_songs WHERE {removed}")
+    _update_search_index(conn)
+    return cursor.rowcount
+
+
+# Builds spotify_songs.db from the csv-file, but only if the csv-file has changed since the last build.
+# Returns True if the database was (re)built and False if it was already up to date.
+@traced("catalog.ingest")
+def ingest_catalog(csv_path=CATALOG_CSV, db_path=SONGS_DB, force=False):
+    version = catalog_version(csv_path)
+    # The columnar copy of the catalog is written once per catalog version, the next process maps it
+    # instead of parsing the csv-file (columnar.py)
+    ensure_columnar_catalog(csv_path, force)
+    conn = connect(db_path, timeout=30)
+    try:
+        # BEGIN IMMEDIATE takes the write lock, so only one process builds the database at a time
+        conn.execute("BEGIN IMMEDIATE")
+        stored_version = get_meta(conn, "csv_version")
+        old_layout = stored_version is None or get_meta(conn, "schema_version") != SCHEMA_VERSION
+        if not force and not old_layout and stored_version == version:
+            conn.rollback()
+            return False
+        if old_layout:
+            # Database from an older version of the app (created with to_sql or with other column types),
+            # it is rebuilt from scratch
+            conn.execute("DROP TABLE IF EXISTS spotify_songs")
+            conn.execute("DROP TABLE IF EXISTS tracks_fts")
+
+        df = _read_catalog_for_db(csv_path)
+        upsert_tracks(conn, df)
+        _delete_removed_tracks(conn)
+        conn.execute("DROP TABLE IF EXISTS temp.spotify_songs_staging")
+        _write_feature_histograms(conn, csv_path)
+
+        set_meta(conn, "csv_version", version)
+        set_meta(conn, "schema_version", SCHEMA_VERSION)
+        set_meta(conn, "ingested_at", datetime.now().isoformat(timespec="seconds"))
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+# Called by the app on every rerun: the database is only checked once per process and catalog version
+def ensure_catalog_db(csv_path=CATALOG_CSV, db_path=SONGS_DB):
+    version = catalog_version(csv_path)
+    with _ingest_lock:
+        if _ingested_versions.get(db_path) == version:
+            return False
+        rebuilt = ingest_catalog(csv_path, db_path)
+        _ingested_versions[db_path] = version
+        return rebuilt
+
+
+# Command line entry point to build the database at deploy time: python ingest.py [--force]
+def main():
+    parser = argparse.ArgumentParser(description="Build spotify_songs.db, the columnar catalog and the nearest neighbour index "
+                                                 "from spotify_songs.csv")
+    parser.add_argument("--csv", default=CATALOG_CSV, help="path of the catalog csv-file")
+    parser.add_argument("--db", default=SONGS_DB, help="path of the songs database")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the csv-file has not changed")
+    args = parser.parse_args()
+
+    if ingest_catalog(args.csv, args.db, force=args.force):
+        print(f"{args.db} has been built from {args.csv}")
+    else:
+        print(f"{args.db} is already up to date")
+
+    # The nearest neighbour index is built once per catalog version as well
+    from knn_index import build_knn_index
+    print(f"Nearest neighbour index written to {build_knn_index(args.csv)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import threading
+import joblib
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+from catalog import CATALOG_CSV, FEATURE_COLUMNS, load_catalog, catalog_version, script_dir
+from features import (fit_feature_space, feature_space_id, transform_features, to_metric_distances,
+                      save_feature_space, load_feature_space)
+from tracing import span, traced
+
+#***************************************************************
+# Prebuilt nearest neighbour index for "Find similar songs"
+#***************************************************************
+
+# One sub-directory per catalog version and feature space: knn_index/<version>-<feature space id>/
+INDEX_DIR = os.path.join(script_dir, "knn_index")
+
+# Indexes that are already loaded in this process: directory name -> KnnIndex
+_index_cache = {}
+_index_lock = threading.Lock()
+
+
+# Fitted model plus the catalog rows it was fitted on. rows[i] is the position in the catalog
+# dataframe of the i-th point of the index, so results can be looked up with df.iloc.
+# features is the scaled and weighted float32 matrix, space describes the scaling (see features.py).
+class KnnIndex:
+    def __init__(self, model, features, rows, space, version):
+        self.model = model
+        self.features = features
+        self.rows = rows
+        self.space = space
+        self.version = version
+
+    # Transforms raw audio features into the scaled feature space of the index
+    def transform(self, raw_features):
+        return transform_features(raw_features, self.space)
+
+    # Same as kneighbors, but for features that are already in the scaled feature space
+    def kneighbors_scaled(self, features, n_neighbors):
+        n_neighbors = min(n_neighbors, len(self.rows))
+        with span("knn.query", points=len(features), neighbors=n_neighbors):
+            distances, indices = self.model.kneighbors(np.asarray(features, dtype=np.float32), n_neighbors=n_neighbors)
+        return to_metric_distances(distances, self.space), self.rows[indices]
+
+    # Returns the distances and the catalog positions of the n nearest songs for every row of raw audio features
+    def kneighbors(self, raw_features, n_neighbors):
+        return self.kneighbors_scaled(self.transform(raw_features), n_neighbors)
+
+
+# Function to create the raw feature matrix. A track is listed once per playlist in the catalog,
+# it is only added once to the index so the recommendations do not contain duplicates.
+def build_feature_matrix(df):
+    unique_tracks = ~df["track_id"].duplicated().to_numpy()
+    rows = np.flatnonzero(unique_tracks)
+    features = np.ascontiguousarray(df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)[rows])
+    return features, rows
+
+
+# Name of the directory of an index
+def _index_name(version, method, weights, metric):
+    return f"{version}-{feature_space_id(method, weights, metric)}"
+
+
+# Fits the scaling and the index for the catalog and writes both to knn_index/<version>-<feature space id>/.
+# The files are written into a temporary directory first, so other workers never see a half written index.
+@traced("knn.fit")
+def build_knn_index(csv_path=CATALOG_CSV, index_dir=INDEX_DIR, method="zscore", weights=None, metric="euclidean"):
+    df = load_catalog(csv_path)
+    version = catalog_version(csv_path)
+    raw_features, rows = build_feature_matrix(df)
+
+    # The scaled matrix is computed once here, queries only transform the few selected songs
+    space = fit_feature_space(raw_features, method, weights, metric)
+    features = transform_features(raw_features, space)
+    model = NearestNeighbors(algorithm="kd_tree", metric="euclidean")
+    model.fit(features)
+
+    os.makedirs(index_dir, exist_ok=True)
+    target_dir = os.path.join(index_dir, _index_name(version, method, weights, metric))
+    build_dir = tempfile.mkdtemp(dir=index_dir, prefix=".build-")
+    try:
+        os.chmod(build_dir, 0o755)
+        np.save(os.path.join(build_dir, "features.npy"), features)
+        np.save(os.path.join(build_dir, "rows.npy"), rows)
+        save_feature_space(space, os.path.join(build_dir, "space.json"))
+        joblib.dump(model, os.path.join(build_dir, "model.joblib"))
+        if os.path.exists(target_dir):
+            shutil.rmtree(target_dir)
+        os.replace(build_dir, target_dir)
+    except Exception:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    return target_dir
+
+
+# Function to load an index from disk, the arrays are memory-mapped and shared between the workers by the OS
+@traced("knn.load")
+def _read_knn_index(version_dir, version):
+    features = np.load(os.path.join(version_dir, "features.npy"), mmap_mode="r")
+    rows = np.load(os.path.join(version_dir, "rows.npy"), mmap_mode="r")
+    model = joblib.load(os.path.join(version_dir, "model.joblib"), mmap_mode="r")
+    space = load_feature_space(os.path.join(version_dir, "space.json"))
+    return KnnIndex(model, features, rows, space, version)
+
+
+# Returns the index for the current catalog version and feature space. It is built only if it does not exist on disk yet.
+def load_knn_index(csv_path=CATALOG_CSV, index_dir=INDEX_DIR, method="zscore", weights=None, metric="euclidean"):
+    version = catalog_version(csv_path)
+    name = _index_name(version, method, weights, metric)
+    with _index_lock:
+        if name in _index_cache:
+            return _index_cache[name]
+
+        version_dir = os.path.join(index_dir, name)
+        if not os.path.exists(os.path.join(version_dir, "model.joblib")):
+            build_knn_index(csv_path, index_dir, method, weights, metric)
+        knn_index = _read_knn_index(version_dir, version)
+
+        # Indexes of older catalog versions are no longer needed in this process
+        for cached_name in [cached for cached in _index_cache if not cached.startswith(version)]:
+            del _index_cache[cached_name]
+        _index_cache[name] = knn_index
+        return knn_index
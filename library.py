@@ -0,0 +1,213 @@
+import os
+import glob
+import uuid
+import sqlite3
+import argparse
+from datetime import datetime
+import pandas as pd
+from catalog import CATALOG_CSV, load_tracks, script_dir
+from db import connection
+from analytics import ensure_analytics_tables, update_user_analytics, invalidate_user_analytics, user_analytics
+
+#***************************************************************
+# Song library of all users (one database instead of songs/{user_id}.db)
+#***************************************************************
+
+LIBRARY_DB = os.path.join(script_dir, "library.db")
+
+# Directory of the old per-user databases, only needed for the migration
+SONGS_DIR = os.path.join(script_dir, "songs")
+
+# Library databases whose tables were already created in this process
+_created_libraries = set()
+
+
+# Function to create the tables. A playlist only stores the track ids, the other columns come from the catalog:
+#   playlists        (playlist_id, user_id, name, created_at)
+#   playlist_tracks  (playlist_id, track_id, position, score)
+# The tables are only created once per process and database file.
+def ensure_library(library_path=LIBRARY_DB):
+    if library_path in _created_libraries:
+        return
+    with connection(library_path) as conn:
+        conn.execute("""CREATE TABLE IF NOT EXISTS playlists (
+            playlist_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, name TEXT NOT NULL, created_at TEXT NOT NULL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_playlists_user ON playlists (user_id)")
+        conn.execute("""CREATE TABLE IF NOT EXISTS playlist_tracks (
+            playlist_id TEXT NOT NULL REFERENCES playlists (playlist_id), track_id TEXT NOT NULL,
+            position INTEGER NOT NULL, score REAL,
+            PRIMARY KEY (playlist_id, track_id)) WITHOUT ROWID""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_playlist_tracks_track ON playlist_tracks (track_id)")
+        ensure_analytics_tables(conn)
+        _migrate_user_songs_table(conn)
+    _created_libraries.add(library_path)
+
+
+# Function to insert one playlist with its tracks into an open connection. A track is stored once per playlist
+# (at its first position), returns the ids of the stored tracks.
+def _insert_playlist(conn, playlist_id, user_id, name, created_at, track_ids, scores=None):
+    track_ids = list(track_ids)
+    scores = [None] * len(track_ids) if scores is None else [None if pd.isna(score) else float(score) for score in scores]
+    first_scores = {}
+    for track_id, score in zip(track_ids, scores):
+        first_scores.setdefault(track_id, score)
+    conn.execute("INSERT OR REPLACE INTO playlists (playlist_id, user_id, name, created_at) VALUES (?, ?, ?, ?)",
+                 (playlist_id, user_id, name, created_at))
+    conn.executemany("INSERT OR IGNORE INTO playlist_tracks (playlist_id, track_id, position, score) VALUES (?, ?, ?, ?)",
+                     [(playlist_id, track_id, position, score)
+                      for position, (track_id, score) in enumerate(first_scores.items())])
+    return list(first_scores)
+
+
+# Function to insert the rows of an old user_songs table (full copies of catalog rows) as playlists.
+# The statistics of the user are counted again on their next use.
+def _insert_user_songs_rows(conn, user_id, songs_df):
+    for playlist_id, playlist_df in songs_df.groupby("playlist_id", sort=False):
+        name = playlist_df["playlist_name"].iloc[0] if "playlist_name" in playlist_df else str(playlist_id)
+        _insert_playlist(conn, f"{user_id}-{playlist_id}", user_id, name, str(playlist_id), playlist_df["track_id"])
+    invalidate_user_analytics(conn, user_id)
+
+
+# Function to convert the user_songs table of the previous version of library.db into the new tables
+def _migrate_user_songs_table(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_songs'").fetchone()
+    if not exists:
+        return
+    songs_df = pd.read_sql_query("SELECT user_id, playlist_id, playlist_name, track_id FROM user_songs", conn)
+    for user_id, user_songs_df in songs_df.groupby("user_id", sort=False):
+        _insert_user_songs_rows(conn, user_id, user_songs_df)
+    conn.execute("DROP TABLE user_songs")
+
+
+# Saves a playlist of a user: only the track ids (in this order) and their scores are stored.
+# The statistics of the user (analytics.py) are updated in the same transaction. Returns the id of the new playlist.
+def save_playlist(user_id, name, track_ids, scores=None, library_path=LIBRARY_DB, csv_path=CATALOG_CSV):
+    ensure_library(library_path)
+    playlist_id = uuid.uuid4().hex
+    created_at = datetime.now().isoformat(timespec="seconds")
+    with connection(library_path) as conn:
+        # The statistics count the stored tracks, a track listed twice in track_ids is stored once
+        stored_ids = _insert_playlist(conn, playlist_id, user_id, name, created_at, track_ids, scores)
+        update_user_analytics(conn, user_id, stored_ids, csv_path)
+    return playlist_id
+
+
+# Returns the songs of all playlists of a user with the given columns. Besides the catalog columns
+# playlist_id, playlist_name (name of the user's playlist), created_at, position and score can be used.
+# The songs of a playlist stay together (created_at only has seconds, playlist_id separates playlists of one second).
+def load_user_songs(user_id, columns, distinct=False, library_path=LIBRARY_DB, csv_path=CATALOG_CSV):
+    ensure_library(library_path)
+    query = """
+        SELECT p.playlist_id, p.name AS playlist_name, p.created_at, t.track_id, t.position, t.score
+        FROM playlists p JOIN playlist_tracks t ON t.playlist_id = p.playlist_id
+        WHERE p.user_id = ?
+        ORDER BY p.created_at, p.playlist_id, t.position
+    """
+    with connection(library_path) as conn:
+        playlist_df = pd.read_sql_query(query, conn, params=(user_id,))
+
+    tracks = load_tracks(csv_path)
+    catalog_columns = [column for column in columns if column not in playlist_df.columns]
+    songs_df = playlist_df.join(tracks[catalog_columns], on="track_id")[list(columns)]
+    if distinct:
+        songs_df = songs_df.drop_duplicates()
+    return songs_df.reset_index(drop=True)
+
+
+# Returns the playlists (playlist_id, user_id, name, created_at, songs) of a user and/or with the given ids,
+# newest first. The id of a playlist is random, a user can give it to a friend to share the playlist.
+def list_playlists(user_id=None, playlist_ids=None, library_path=LIBRARY_DB):
+    ensure_library(library_path)
+    conditions, params = [], []
+    if user_id is not None:
+        conditions.append("p.user_id = ?")
+        params.append(user_id)
+    if playlist_ids is not None:
+        conditions.append(f"p.playlist_id IN ({', '.join('?' for _ in playlist_ids)})")
+        params.extend(playlist_ids)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        SELECT p.playlist_id, p.user_id, p.name, p.created_at, COUNT(t.track_id) AS songs
+        FROM playlists p LEFT JOIN playlist_tracks t ON t.playlist_id = p.playlist_id
+        {where}
+        GROUP BY p.playlist_id
+        ORDER BY p.created_at DESC
+    """
+    with connection(library_path) as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+
+# Returns the songs of one playlist in their order with the given catalog columns (and track_id)
+def load_playlist_tracks(playlist_id, columns, library_path=LIBRARY_DB, csv_path=CATALOG_CSV):
+    ensure_library(library_path)
+    with connection(library_path) as conn:
+        track_ids = [row[0] for row in conn.execute(
+            "SELECT track_id FROM playlist_tracks WHERE playlist_id = ? ORDER BY position", (playlist_id,))]
+    tracks = load_tracks(csv_path)
+    track_ids = [track_id for track_id in track_ids if track_id in tracks.index]
+    return tracks.loc[track_ids, list(columns)].reset_index()
+
+
+# Returns the precomputed statistics of a user's library (top artists, genres, feature histograms),
+# see analytics.user_analytics. Nothing is counted again as long as the library didn't change.
+def load_user_analytics(user_id, library_path=LIBRARY_DB, csv_path=CATALOG_CSV):
+    ensure_library(library_path)
+    with connection(library_path) as conn:
+        return user_analytics(conn, user_id, library_path, csv_path)
+
+
+# Returns the tracks both users have in their libraries (e.g. for Melody Match)
+def shared_tracks(user_id_1, user_id_2, library_path=LIBRARY_DB, csv_path=CATALOG_CSV):
+    ensure_library(library_path)
+    query = """
+        SELECT DISTINCT a.track_id FROM playlist_tracks a
+        JOIN playlists pa ON pa.playlist_id = a.playlist_id AND pa.user_id = ?
+        JOIN playlist_tracks b ON b.track_id = a.track_id
+        JOIN playlists pb ON pb.playlist_id = b.playlist_id AND pb.user_id = ?
+    """
+    with connection(library_path) as conn:
+        shared_df = pd.read_sql_query(query, conn, params=(user_id_1, user_id_2))
+    return shared_df.join(load_tracks(csv_path)[["track_name", "track_artist"]], on="track_id")
+
+
+# Copies the songs of the old per-user databases (songs/{user_id}.db) into the library.
+# Returns the number of migrated users. With remove_files=True the old files are deleted afterwards.
+def migrate_user_databases(songs_dir=SONGS_DIR, library_path=LIBRARY_DB, remove_files=False):
+    ensure_library(library_path)
+    migrated = 0
+    for user_db_path in sorted(glob.glob(os.path.join(songs_dir, "*.db"))):
+        user_id = os.path.splitext(os.path.basename(user_db_path))[0]
+        conn_user_db = sqlite3.connect(user_db_path)
+        try:
+            songs_df = pd.read_sql_query("SELECT * FROM user_songs", conn_user_db)
+        except pd.errors.DatabaseError:
+            # The database has no user_songs table
+            songs_df = pd.DataFrame()
+        finally:
+            conn_user_db.close()
+
+        with connection(library_path) as conn:
+            if not songs_df.empty:
+                _insert_user_songs_rows(conn, user_id, songs_df)
+        migrated += 1
+        print(f"{user_id}: {len(songs_df)} songs migrated")
+
+        if remove_files:
+            os.remove(user_db_path)
+    return migrated
+
+
+# Command line entry point for the migration: python library.py [--remove-files]
+def main():
+    parser = argparse.ArgumentParser(description="Move the songs of songs/{user_id}.db into library.db")
+    parser.add_argument("--songs-dir", default=SONGS_DIR, help="directory of the old per-user databases")
+    parser.add_argument("--library", default=LIBRARY_DB, help="path of the library database")
+    parser.add_argument("--remove-files", action="store_true", help="delete the old databases after the migration")
+    args = parser.parse_args()
+
+    migrated = migrate_user_databases(args.songs_dir, args.library, args.remove_files)
+    print(f"{migrated} user databases migrated into {args.library}")
+
+
+if __name__ == "__main__":
+    main()
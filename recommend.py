@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from tracing import traced
+
+#***************************************************************
+# Recommendation engine: similar songs for all songs of the basket
+#***************************************************************
+
+# Modes of the engine with the label shown in the app
+RECOMMENDATION_MODES = {
+    "centroid": "Similar to the average of your songs",
+    "min_distance": "Close to any of your songs",
+    "rank_fusion": "Similar to many of your songs",
+}
+
+# Constant of the reciprocal rank fusion, a higher value gives lower ranks more weight
+RRF_K = 60
+
+
+# Function to keep the best score per catalog row. rows/scores are flat arrays, lower scores are better.
+def _best_score_per_row(rows, scores):
+    order = np.argsort(scores, kind="stable")
+    unique_rows, first = np.unique(rows[order], return_index=True)
+    return unique_rows, scores[order][first]
+
+
+# Function to add up the scores per catalog row (used for the rank fusion)
+def _sum_score_per_row(rows, scores):
+    unique_rows, inverse = np.unique(rows, return_inverse=True)
+    return unique_rows, np.bincount(inverse, weights=scores)
+
+
+# Function to transform the songs of the basket into the points that are searched in the index:
+# the average of the basket for "centroid", every song of the basket for the other modes
+def _query_points(knn, cart_features, mode):
+    if mode not in RECOMMENDATION_MODES:
+        raise ValueError(f"Mode must be one of {list(RECOMMENDATION_MODES)}, not {mode!r}")
+    features = knn.transform(cart_features)
+    if mode == "centroid":
+        centroid = features.mean(axis=0, keepdims=True)
+        if knn.space["metric"] == "cosine":
+            centroid /= max(np.linalg.norm(centroid), 1e-12)
+        return centroid
+    return features
+
+
+# Function to combine the neighbours of the query points into one list of n songs (best first)
+def _rank_neighbours(catalog_df, distances, rows, cart_track_ids, n, mode):
+    if mode == "centroid":
+        rows, scores = rows[0], distances[0]
+    elif mode == "min_distance":
+        rows, scores = _best_score_per_row(rows.ravel(), distances.ravel())
+    else:
+        ranks = np.broadcast_to(np.arange(rows.shape[1]), rows.shape)
+        rows, scores = _sum_score_per_row(rows.ravel(), 1.0 / (RRF_K + 1 + ranks.ravel()))
+        # Higher is better, the sort below is ascending
+        scores = -scores
+
+    # Songs that are already in the basket are not recommended again
+    in_cart = np.isin(catalog_df["track_id"].to_numpy()[rows], np.asarray(list(cart_track_ids)))
+    rows, scores = rows[~in_cart], scores[~in_cart]
+
+    best = np.argsort(scores, kind="stable")[:n]
+    rows, scores = rows[best], scores[best]
+    if mode == "rank_fusion":
+        scores = -scores
+    return rows, scores
+
+
+# Finds n songs for the basket with one batched query on the index.
+# cart_features are the raw audio features (one row per song of the basket), cart_track_ids the ids of these songs.
+# Returns the catalog positions of the songs (best first) and their scores:
+#   centroid      distance to the average of the basket (lower = better)
+#   min_distance  smallest distance to one of the songs of the basket (lower = better)
+#   rank_fusion   sum of 1 / (RRF_K + rank) over the songs of the basket (higher = better)
+@traced("recommend")
+def recommend(knn, catalog_df, cart_features, cart_track_ids, n, mode="centroid"):
+    points = _query_points(knn, cart_features, mode)
+    # Songs of the basket can be found again, so a few more songs than needed are requested
+    distances, rows = knn.kneighbors_scaled(points, n + len(cart_features))
+    return _rank_neighbours(catalog_df, distances, rows, cart_track_ids, n, mode)
+
+
+# Same as recommend for several baskets at once: the points of all baskets are searched in one query.
+# requests is a list of (cart_features, cart_track_ids, n, mode), returns a list of (rows, scores).
+@traced("recommend.batch")
+def recommend_batch(knn, catalog_df, requests):
+    if not requests:
+        return []
+    points = [_query_points(knn, cart_features, mode) for cart_features, _, _, mode in requests]
+    wanted = [n + len(cart_features) for cart_features, _, n, _ in requests]
+    distances, rows = knn.kneighbors_scaled(np.vstack(points), max(wanted))
+
+    results = []
+    start = 0
+    for (_, cart_track_ids, n, mode), request_points, n_neighbors in zip(requests, points, wanted):
+        end = start + len(request_points)
+        # The neighbours are sorted, so the first n_neighbors are the same as in a query of its own
+        results.append(_rank_neighbours(catalog_df, distances[start:end, :n_neighbors], rows[start:end, :n_neighbors],
+                                        cart_track_ids, n, mode))
+        start = end
+    return results
+
+
+# Same as recommend, but returns the catalog rows as dataframe with a "score" column
+def recommend_tracks(knn, catalog_df, cart_features, cart_track_ids, n, mode="centroid"):
+    rows, scores = recommend(knn, catalog_df, cart_features, cart_track_ids, n, mode)
+    tracks = catalog_df.iloc[rows].copy()
+    tracks["score"] = pd.Series(scores, index=tracks.index).round(4)
+    return tracks
@@ -0,0 +1,53 @@
+import pandas as pd
+from ingest import SEARCH_COLUMNS
+
+#***************************************************************
+# Search in the catalog with the FTS5 index (built by ingest.py)
+#***************************************************************
+
+# Number of results shown per page
+PAGE_SIZE = 50
+
+# The total number of hits is only counted up to this limit, so broad searches stay fast
+MAX_COUNT = 10000
+
+
+# Function to build the condition for one column of tracks_fts. The trigram index needs at least 3 characters,
+# shorter queries are answered with LIKE, which reads every row of tracks_fts (one row per track) without the index.
+def _match_condition(column, query):
+    if len(query) >= 3:
+        phrase = query.replace('"', '""')
+        return "tracks_fts MATCH ?", f'{column} : "{phrase}"', "rank"
+    return f"{column} LIKE ?", f"%{query}%", "rowid"
+
+
+# Searches tracks where `column` contains `query`. Returns the requested page with one row per track
+# (best matches first, broad searches in catalog order) and the total number of hits (at most MAX_COUNT).
+def search_tracks(conn, column, query, select_columns, page=1, page_size=PAGE_SIZE):
+    if column not in SEARCH_COLUMNS:
+        raise ValueError(f"Search column must be one of {SEARCH_COLUMNS}, not {column!r}")
+
+    condition, parameter, order = _match_condition(column, query)
+    query_count = f"SELECT COUNT(*) FROM (SELECT 1 FROM tracks_fts WHERE {condition} LIMIT ?)"
+    total = conn.execute(query_count, (parameter, MAX_COUNT)).fetchone()[0]
+    if total >= MAX_COUNT:
+        # Ranking would compute bm25 for every hit of a broad search (hundreds of thousands in a large
+        # catalog), these are listed in catalog order instead
+        order = "rowid"
+
+    columns = ", ".join(f"s.{name}" for name in select_columns)
+    # tracks_fts has one row per track, so the page is ranked and cut on the FTS5 table and
+    # only the rows of the page are read from spotify_songs (rowid = first row of the track)
+    query_page = f"""
+        SELECT {columns} FROM (
+            SELECT rowid, {order} AS score FROM tracks_fts WHERE {condition} ORDER BY {order} LIMIT ? OFFSET ?
+        ) m JOIN spotify_songs s ON s.rowid = m.rowid
+        ORDER BY m.score
+    """
+    results = pd.read_sql_query(query_page, conn, params=(parameter, page_size, (page - 1) * page_size))
+    return results, total
+
+
+# Number of pages for a number of hits
+def page_count(total, page_size=PAGE_SIZE):
+    return max(1, -(-total // page_size))
@@ -1,5 +1,40 @@
-import streamlit as st
 import time
+import streamlit as st
+from catalog import FEATURE_COLUMNS, load_catalog
+from library import list_playlists, load_playlist_tracks
+from views import AppContext, render_login
+from blend import BLEND_MODES, blend_tracks
+from feature_filter import feature_bounds, filter_tracks
+
+# Breite der Fenster um die Werte der Slider (Anteil des Wertebereichs)
+ATTRIBUTE_WINDOW = 0.1
+
+# Pfade der Datenbanken (Anmeldung und Playlists), dieselben wie in Project_Code.py
+context = AppContext()
+
+
+# Auswahl von 2 Playlists: die eigenen Playlists des Nutzers und die Playlist, deren ID ein Freund geteilt hat.
+# Die ID einer Playlist ist zufällig, ohne sie sieht man die Playlists der anderen Nutzer nicht.
+def select_playlists(user_id):
+    own_df = list_playlists(user_id=user_id)
+    with st.expander("Share your playlists"):
+        st.write("Give the ID of a playlist to a friend, so they can mix it with one of theirs.")
+        st.dataframe(own_df[["name", "playlist_id", "songs"]], use_container_width=True, hide_index=True)
+    labels = {row.playlist_id: f"{row.name} ({row.songs} songs)" for row in own_df.itertuples()}
+
+    shared_id = st.text_input("ID of a playlist shared by a friend (optional)").strip()
+    if shared_id:
+        shared_df = list_playlists(playlist_ids=[shared_id])
+        if shared_df.empty:
+            st.warning("There is no playlist with this ID.")
+        labels.update({row.playlist_id: f"{row.name} (shared, {row.songs} songs)" for row in shared_df.itertuples()
+                       if row.playlist_id not in labels})
+
+    # Hinweis auf die maximale Auswahl
+    st.write("Choose 2 playlists:")
+    # Multiselect mit einer maximalen Auswahl von 2 Playlists
+    return st.multiselect("Playlists", list(labels), format_func=labels.get, max_selections=2,
+                          label_visibility="collapsed")
 
 
 def main():
@@ -29,35 +64,49 @@ def main():
     st.write("Welcome to Melody Match! Find the perfect playlist for you and your friends.")
     st.header("Find your Match!")
 
-    # Hinweis auf die maximale Auswahl
-    st.write("Choose 2 playlists:")
-
-    #Liste der Playlists
-    artists = ["Playlist 1", "Playlist 2", "Playlist 3", "Playlist 4", "Playlist 5"]
+    # Anmeldung in der Seitenleiste (views/login.py), gemischt werden nur die eigenen und geteilte Playlists
+    for key, value in {"logged_in": False, "username": "", "user_id": "", "sidebar_open": True}.items():
+        st.session_state.setdefault(key, value)
+    render_login(context)
+    if st.session_state.logged_in:
+        selected_playlists = select_playlists(st.session_state.user_id)
+    else:
+        st.info("Please log in (sidebar) to mix your playlists.")
+        selected_playlists = []
 
-    # Multiselect mit einer maximalen Auswahl von 2 Playlists
-    selected_artists = st.multiselect("", artists, max_selections=2)  # Maximale Anzahl von auswählbaren Künstlern
+    blend_mode = st.selectbox("How should the playlists be mixed?", list(BLEND_MODES), format_func=BLEND_MODES.get)
+    n_songs = st.slider("Number of songs:", min_value=10, max_value=100, value=30, step=10)
 
-    # Wenn mehr als 2 Künstler ausgewählt werden, zeige eine Warnung
-    if len(selected_artists) > 2:
-        st.warning("A maximum of 2 Playlists can be selected.")
-    
-    if len(selected_artists) > 0:
+    if len(selected_playlists) == 2:
         mix_button = st.button("Mix up")  # Der Button wird hier einmalig definiert
         
         if mix_button:
-            st.write("Mixing up your preferences...")  # Placeholder für Machine Learning Logik
+            st.write("Mixing up your preferences...")
+            started = time.perf_counter()
             
-            # Ladebalken mit st.progress erstellen
-            progress_bar = st.progress(0)
-
-            # Beispielhafte Ladeaktion, die 100 Schritte dauert
-            for percent_complete in range(100):
-                time.sleep(0.05)  # Wartezeit simuliert das Laden
-                progress_bar.progress(percent_complete + 1)  # Ladebalken erhöhen
-            st.success("Loading complete!")  # Erfolgsmeldung nach Abschluss
+            # Der Ladebalken zeigt die echten Schritte der Berechnung
+            progress_bar = st.progress(0, text="Loading the playlists")
+            tracks_1 = load_playlist_tracks(selected_playlists[0], ["track_name", "track_artist"] + FEATURE_COLUMNS)
+            tracks_2 = load_playlist_tracks(selected_playlists[1], ["track_name", "track_artist"] + FEATURE_COLUMNS)
+            if tracks_1.empty or tracks_2.empty:
+                progress_bar.empty()
+                st.warning("Both playlists need songs from the catalog.")
+            else:
+                # Der Index der ähnlichen Songs wird nur einmal pro Prozess geladen (knn_index.py)
+                from knn_index import load_knn_index
+                progress_bar.progress(0.1, text="Loading the song index")
+                knn = load_knn_index()
+
+                # Alle Songs beider Playlists werden in einer Abfrage gesucht (blend.py)
+                def report(fraction, text):
+                    progress_bar.progress(0.1 + 0.9 * fraction, text=text)
+                match_df = blend_tracks(knn, load_catalog(), tracks_1, tracks_2, n_songs, blend_mode, report)
+
+                st.success(f"Done in {time.perf_counter() - started:.2f} seconds!")  # Erfolgsmeldung nach Abschluss
+                st.dataframe(match_df[["track_name", "track_artist", "playlist_genre", "distance_1", "distance_2"]],
+                             use_container_width=True, hide_index=True)
     else:
-        # Wenn keine Auswahl getroffen wurde, wird der Button deaktiviert
+        # Wenn keine zwei Playlists ausgewählt wurden, wird der Button deaktiviert
         st.button("Mix up", disabled=True)
     
         
@@ -77,12 +126,26 @@ def main():
     # Widgets innerhalb des Containers anzeigen
     with st.expander("Choose the attributes of your desired Playlist", expanded=st.session_state.expander_opened):
         st.header("Choose the attributes of your desired Playlist")
-        st.slider("Tempo", min_value=0.0, max_value=1.0, value=0.4, step=0.2)
-        st.slider("Valence", min_value=0.0, max_value=1.0, value=0.4, step=0.2)
-        st.slider("Energy", min_value=0.0, max_value=1.0, value=0.4, step=0.2)
-        st.slider("Danceability", min_value=0.0, max_value=1.0, value=0.4, step=0.2)
+        attributes = {
+            "tempo": st.slider("Tempo", min_value=0.0, max_value=1.0, value=0.4, step=0.2),
+            "valence": st.slider("Valence", min_value=0.0, max_value=1.0, value=0.4, step=0.2),
+            "energy": st.slider("Energy", min_value=0.0, max_value=1.0, value=0.4, step=0.2),
+            "danceability": st.slider("Danceability", min_value=0.0, max_value=1.0, value=0.4, step=0.2),
+        }
 
     if st.button("Search Playlists"):
-        st.write("Recommended songs for you could be: ...")
+        # Die Slider geben die Position im Wertebereich des Katalogs an, gesucht wird in einem Fenster darum
+        bounds = feature_bounds()
+        ranges = {}
+        for feature, value in attributes.items():
+            low, high = bounds[feature]
+            window = ATTRIBUTE_WINDOW * (high - low)
+            ranges[feature] = (low + value * (high - low) - window, low + value * (high - low) + window)
+        songs_df, total = filter_tracks(ranges, ["track_name", "track_artist"] + list(attributes), page_size=20)
+        if songs_df.empty:
+            st.write("No songs found, try other attributes.")
+        else:
+            st.write(f"Recommended songs for you could be ({total} songs found):")
+            st.dataframe(songs_df, use_container_width=True, hide_index=True)
 if __name__ == "__main__":
     main()
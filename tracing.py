@@ -0,0 +1,172 @@
+import os
+import time
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import wraps
+import numpy as np
+
+#***************************************************************
+# Timing spans of the hot paths (page renders, SQL queries, catalog, models)
+#***************************************************************
+
+# Tracing can be switched off with TRACING=0, a span then costs one function call
+TRACING = os.environ.get("TRACING", "1") != "0"
+
+# Durations kept per span name for the percentiles (the most recent ones)
+SAMPLES_PER_SPAN = 2048
+
+# Reruns kept per session and spans kept per rerun
+RERUNS_PER_SESSION = 20
+SPANS_PER_RERUN = 500
+
+# Sessions whose reruns are kept (the least recently active session is dropped first)
+MAX_SESSIONS = 200
+
+# Length of the SQL text stored with a span
+SQL_TEXT_LENGTH = 200
+
+# Aggregated durations: span name -> {"count", "total", "samples"}
+_stats = {}
+_stats_lock = threading.Lock()
+
+# Reruns of the sessions: session id -> deque of {"started_at", "spans"}
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+# Spans of the current rerun (None outside of a rerun, e.g. in the warm-up thread) and nesting depth
+_current_spans = contextvars.ContextVar("trace_spans", default=None)
+_depth = contextvars.ContextVar("trace_depth", default=0)
+
+
+# Starts the trace of a new rerun of the session, the spans of this thread are added to it
+def start_trace(session_id):
+    spans = []
+    with _sessions_lock:
+        reruns = _sessions.pop(session_id, None) or deque(maxlen=RERUNS_PER_SESSION)
+        reruns.append({"started_at": time.time(), "spans": spans})
+        _sessions[session_id] = reruns
+        while len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+    _current_spans.set(spans)
+    _depth.set(0)
+
+
+def _aggregate(key, duration):
+    with _stats_lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = {"count": 0, "total": 0.0, "samples": deque(maxlen=SAMPLES_PER_SPAN)}
+        stats["count"] += 1
+        stats["total"] += duration
+        stats["samples"].append(duration)
+
+
+# Function to add a span to the trace of the current rerun, returns the entry (None outside of a rerun)
+def _add_to_trace(name):
+    spans = _current_spans.get()
+    if spans is None or len(spans) >= SPANS_PER_RERUN:
+        return None
+    entry = {"name": name, "duration_ms": None, "depth": _depth.get()}
+    spans.append(entry)
+    return entry
+
+
+# Adds a finished span to the percentiles and to the trace of the current rerun.
+# aggregate is the name in the percentiles (e.g. all SELECT statements under "sql.select").
+def record_span(name, duration, attributes=None, aggregate=None):
+    _aggregate(aggregate or name, duration)
+    entry = _add_to_trace(name)
+    if entry is not None:
+        entry["duration_ms"] = duration * 1000
+        entry.update(attributes or {})
+
+
+# Measures the block as one span, spans within the block are nested below it:
+#     with span("knn.fit", tracks=len(df)):
+#         ...
+@contextmanager
+def span(name, **attributes):
+    if not TRACING:
+        yield attributes
+        return
+    # The entry is added at the start, so the trace lists the spans in the order they started
+    entry = _add_to_trace(name)
+    token = _depth.set(_depth.get() + 1)
+    start = time.perf_counter()
+    try:
+        # The block can add attributes that are only known at the end (e.g. the number of rows)
+        yield attributes
+    finally:
+        duration = time.perf_counter() - start
+        _depth.reset(token)
+        _aggregate(name, duration)
+        if entry is not None:
+            entry["duration_ms"] = duration * 1000
+            entry.update(attributes)
+
+
+# Decorator to measure every call of a function as span
+def traced(name):
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Name of the percentiles of an SQL statement: sql.select, sql.insert, ...
+def sql_aggregate(statement):
+    words = statement.split(None, 1)
+    return f"sql.{words[0].lower()}" if words else "sql"
+
+
+def sql_text(statement):
+    return " ".join(statement.split())[:SQL_TEXT_LENGTH]
+
+
+# Returns the percentiles of every span name: name -> {"count", "total_s", "p50_ms", "p95_ms", "p99_ms", "max_ms"}.
+# The percentiles are calculated from the last SAMPLES_PER_SPAN durations, count and total from all of them.
+def span_percentiles():
+    with _stats_lock:
+        snapshot = {name: (stats["count"], stats["total"], list(stats["samples"])) for name, stats in _stats.items()}
+    result = {}
+    for name, (count, total, samples) in sorted(snapshot.items()):
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+        result[name] = {"count": count, "total_s": total, "p50_ms": p50, "p95_ms": p95, "p99_ms": p99,
+                        "max_ms": max(samples) * 1000}
+    return result
+
+
+# Returns the reruns of a session, the most recent one last
+def session_traces(session_id):
+    with _sessions_lock:
+        return list(_sessions.get(session_id, ()))
+
+
+def reset():
+    with _stats_lock:
+        _stats.clear()
+    with _sessions_lock:
+        _sessions.clear()
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+# Returns the percentiles in the Prometheus text format (one summary with a label per span name)
+def prometheus_text(prefix="trackfinder"):
+    metric = f"{prefix}_span_seconds"
+    lines = [f"# HELP {metric} Duration of the traced operations",
+             f"# TYPE {metric} summary"]
+    for name, stats in span_percentiles().items():
+        label = _label(name)
+        for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+            lines.append(f'{metric}{{span="{label}",quantile="{quantile}"}} {stats[key] / 1000:.6f}')
+        lines.append(f'{metric}_sum{{span="{label}"}} {stats["total_s"]:.6f}')
+        lines.append(f'{metric}_count{{span="{label}"}} {stats["count"]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,7 @@
+# Pages of the app. A page module registers its render function with register_page,
+# the order of the imports is the order of the navigation.
+from views.registry import PAGES, Page, register_page, navigation_pages, render_page
+from views.context import AppContext, RESOURCES
+from views.login import render_login
+from views.admin import render_trace_panel
+from views import your_songs, search_songs, filter_songs, find_new_songs, visualizations
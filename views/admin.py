@@ -0,0 +1,44 @@
+import os
+import pandas as pd
+import streamlit as st
+from tracing import TRACING, session_traces, span_percentiles, prometheus_text
+
+#******************************************************
+# Timings of the app for administrators
+#******************************************************
+
+# Users that see the timings panel in the sidebar, e.g. ADMIN_USERS=alice,bob
+ADMIN_USERS = {name.strip() for name in os.environ.get("ADMIN_USERS", "").split(",") if name.strip()}
+
+
+# Function to turn the spans of one rerun into a table, nested spans are indented
+def _spans_table(spans):
+    rows = [{"span": "  " * span["depth"] + span["name"],
+             "ms": None if span["duration_ms"] is None else round(span["duration_ms"], 2),
+             "rows": span.get("rows"), "sql": span.get("sql", "")} for span in spans]
+    return pd.DataFrame(rows, columns=["span", "ms", "rows", "sql"])
+
+
+def _percentiles_table():
+    stats = span_percentiles()
+    table = pd.DataFrame.from_dict(stats, orient="index", columns=["count", "total_s", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+    return table.round(2).sort_values("total_s", ascending=False)
+
+
+# Sidebar panel with the spans of the current rerun, the percentiles of all sessions and the Prometheus metrics.
+# It is rendered last, so the spans of the pages of this rerun are complete.
+def render_trace_panel(session_id):
+    if not TRACING or st.session_state.get("username") not in ADMIN_USERS:
+        return
+    if not st.sidebar.toggle("Show timings", key="show_timings"):
+        return
+
+    st.sidebar.subheader("Timings")
+    reruns = session_traces(session_id)
+    if reruns:
+        spans = reruns[-1]["spans"]
+        st.sidebar.caption(f"This rerun: {len(spans)} spans")
+        st.sidebar.dataframe(_spans_table(spans), hide_index=True)
+    st.sidebar.caption("All sessions (percentiles of the last runs)")
+    st.sidebar.dataframe(_percentiles_table())
+    st.sidebar.download_button("Prometheus metrics", prometheus_text(), file_name="metrics.txt", mime="text/plain")
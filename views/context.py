@@ -0,0 +1,40 @@
+import os
+from catalog import load_catalog, script_dir
+from ingest import ensure_catalog_db
+from library import ensure_library
+from auth import ensure_auth_tables
+
+#***************************************************************
+# Paths and shared resources of the pages
+#***************************************************************
+
+# Resources a page can declare. Every resource is cached for the whole process by its module,
+# loading it again on a rerun is only a lookup.
+RESOURCES = {
+    # Catalog dataframe (catalog.py)
+    "catalog": lambda context: load_catalog(context.catalog_csv),
+    # spotify_songs.db with the search index, rebuilt when the csv-file changed (ingest.py)
+    "songs_db": lambda context: ensure_catalog_db(context.catalog_csv, context.songs_db),
+    # Tables of library.db (library.py)
+    "library": lambda context: ensure_library(context.library_db),
+    # Tables of users.db (auth.py)
+    "users_db": lambda context: ensure_auth_tables(context.users_db),
+}
+
+
+# Paths of the files of the app, handed to every page
+class AppContext:
+    def __init__(self, base_dir=script_dir):
+        self.catalog_csv = os.path.join(base_dir, "spotify_songs.csv")
+        self.songs_db = os.path.join(base_dir, "spotify_songs.db")
+        self.library_db = os.path.join(base_dir, "library.db")
+        self.users_db = os.path.join(base_dir, "users.db")
+
+    def load(self, needs):
+        for name in needs:
+            RESOURCES[name](self)
+
+    # The shared catalog dataframe (read-only)
+    @property
+    def catalog(self):
+        return load_catalog(self.catalog_csv)
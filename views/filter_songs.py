@@ -0,0 +1,121 @@
+import math
+import streamlit as st
+from search import page_count
+from feature_filter import filter_tracks, estimate_count, feature_bounds, PAGE_SIZE as FILTER_PAGE_SIZE
+from views.registry import register_page
+
+#**********************************************************************
+# 6. Filtering by audio features
+#**********************************************************************
+
+# The songs are taken from the in-memory filter index of the catalog (feature_filter.py), the songs database is not needed
+@register_page("Filter by Audio Features", needs=["catalog"])
+def render(context):
+    # Selection of the variables shown in the table
+    columns_filter = ["track_artist", "track_name", "tempo", "valence", "energy", "danceability"]
+
+    # Creation of the variables sliders
+    st.subheader("Filter your songs by audio-features")
+    with st.expander("Filter by audio-features", expanded=True):
+        # Tempo-Filter
+        col1, col2, col3 = st.columns([2, 8, 2])
+        with col1:
+            st.write("Slow")
+        with col2:
+            tempo_range = st.slider("Tempo", min_value=0.0, max_value=240.0, value=(0.0, 240.0), step=10.0, label_visibility="collapsed")
+        with col3:
+            st.write("Fast")
+
+        # Valence-Filter
+        col1, col2, col3 = st.columns([2, 8, 2])
+        with col1:
+            st.write("Sad")
+        with col2:
+            valence_range = st.slider("Valence", min_value=0.0, max_value=1.0, value=(0.0, 1.0), step=0.1, label_visibility="collapsed")
+        with col3:
+            st.write("Happy")
+
+        # Energy-Filter
+        col1, col2, col3 = st.columns([2, 8, 2])
+        with col1:
+            st.write("Low energy")
+        with col2:
+            energy_range = st.slider("Energy", min_value=0.0, max_value=1.0, value=(0.0, 1.0), step=0.1, label_visibility="collapsed")
+        with col3:
+            st.write("High energie")
+
+        # Danceability-Filter
+        col1, col2, col3 = st.columns([2, 8, 2])
+        with col1:
+            st.write("Chill music")
+        with col2:
+            danceability_range = st.slider("Danceability", min_value=0.0, max_value=1.0, value=(0.0, 1.0), step=0.1, label_visibility="collapsed")
+        with col3:
+            st.write("Dance music")
+
+        filter_ranges = {"tempo": tempo_range, "valence": valence_range, "energy": energy_range, "danceability": danceability_range}
+
+        # All other audio features of the machine learning model can be filtered too.
+        # Every slider goes from the smallest to the largest value in the catalog, a slider that is not moved doesn't filter.
+        if st.checkbox("More audio features"):
+            bounds_filter = feature_bounds(context.catalog_csv)
+            steps_filter = {"key": 1.0, "mode": 1.0, "loudness": 0.5, "duration_ms": 1000.0}
+            for feature in ["acousticness", "speechiness", "instrumentalness", "liveness", "loudness", "key", "mode", "duration_ms"]:
+                step = steps_filter.get(feature, 0.01)
+                low = math.floor(bounds_filter[feature][0] / step) * step
+                high = math.ceil(bounds_filter[feature][1] / step) * step
+                feature_range = st.slider(feature.capitalize(), min_value=low, max_value=high, value=(low, high), step=step)
+                if feature_range != (low, high):
+                    filter_ranges[feature] = feature_range
+
+        # While the sliders are moved only an estimate from precomputed histograms is shown (no search in the catalog).
+        # The songs are searched when the user clicks "Show songs".
+        st.caption(f"About {estimate_count(filter_ranges, context.catalog_csv)} matching songs")
+        if st.button("Show songs") or "applied_filter_ranges" not in st.session_state:
+            st.session_state.applied_filter_ranges = filter_ranges
+            st.session_state.page_filter = 1
+        applied_filter_ranges = st.session_state.applied_filter_ranges
+        if applied_filter_ranges != filter_ranges:
+            st.info("Click 'Show songs' to update the list.")
+
+        # Select songs according to the filters (sorted in-memory index, only one page is materialised)
+        columns_filter = columns_filter + [feature for feature in applied_filter_ranges if feature not in columns_filter]
+        # page_filter is the key of the page widget, Streamlit removes it while another page is shown
+        filtered_songs, total_filter = filter_tracks(applied_filter_ranges, columns_filter,
+                                                     page=st.session_state.setdefault("page_filter", 1),
+                                                     csv_path=context.catalog_csv)
+
+        # Show filtered songs
+        st.subheader("Filtered songs")
+        if not filtered_songs.empty:
+            st.dataframe(filtered_songs, use_container_width=True, height=300)
+            st.number_input(f"Page (of {page_count(total_filter, FILTER_PAGE_SIZE)})", min_value=1,
+                            max_value=page_count(total_filter, FILTER_PAGE_SIZE), key="page_filter")
+            st.caption(f"{total_filter} songs match your criteria")
+
+            # Show legend 
+            if st.button("Description of audio features", key="audio_features_duplicate"):
+                st.session_state.show_legend = not st.session_state.show_legend
+
+            # Show descriptions when "Legend" is activated
+            if st.session_state.show_legend:
+                st.markdown("""
+                ### Tempo
+                The estimated tempo of the track in beats per minute (BPM).    
+                **Unit:** Beats per minute (BPM).
+
+                ### Valence
+                Indicates the musical positivity of a track. Tracks with a high valence sound cheerful, happy and euphoric.  
+                **Scale:** 0.0 to 1.0 (higher value = more positive).
+
+                ### Danceability
+                Indicates how suitable a track is for dancing. Based on a combination of elements such as tempo, rhythm stability, beat strength and overall rhythm.   
+                **Scale:** 0.0 to 1.0 (higher value = more danceable).
+
+                ### Energy
+                Indicates the level of intensity and activity of a track. Tracks with high energy have a fast tempo, a strong beat and loud instruments.  
+                **Scale:** 0.0 to 1.0 (higher value = more energetic).
+            """)
+
+        else:
+            st.warning("No songs match your chosen criteria.")
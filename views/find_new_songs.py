@@ -0,0 +1,223 @@
+import streamlit as st
+import pandas as pd
+from catalog import FEATURE_COLUMNS
+from db import connection
+from search import search_tracks, page_count
+from recommend import RECOMMENDATION_MODES, recommend_tracks
+from library import save_playlist
+from cart import Cart, cart_tracks
+from views.registry import register_page
+
+#********************************************************************************
+# 7. Playlist creation with machine learning
+#********************************************************************************
+
+# Callbacks of the basket buttons, they run before the next rerun so the checkboxes can be updated too
+def add_to_cart(track_ids):
+    st.session_state.cart.add_many(track_ids)
+    for track_id in track_ids:
+        st.session_state[f"checkbox_{track_id}"] = True
+
+
+def remove_from_cart(track_ids):
+    st.session_state.cart.remove_many(track_ids)
+    for track_id in track_ids:
+        st.session_state[f"checkbox_{track_id}"] = False
+
+
+@register_page("Find New Songs", needs=["songs_db", "catalog", "library"])
+def render(context):
+    with connection(context.songs_db) as conn_songs_db:
+        # CSS for customising the design
+        st.markdown("""
+            <style>
+            .song-list {
+                font-size: 14px !important;
+                line-height: 1.6 !important;
+                display: flex;
+                justify-content: space-between;
+            }
+            .remove-button {
+                font-size: 10px !important;
+                padding: 1px 3px !important;
+                color: red !important;
+                background: none !important;
+                border: none !important;
+                cursor: pointer !important;
+            }
+            .song-count {
+                font-size: 16px !important;
+                font-weight: bold !important;
+                margin-bottom: 10px !important;
+            }
+            </style>
+        """, unsafe_allow_html=True)
+        st.subheader("Create your own playlist!")
+        with st.expander("Find songs based on your preferences", expanded=True):
+            st.write("Choose as many songs as you want. A minimum of 5 is required.")
+            # Add dynamic search option
+            search_column_2 = st.selectbox("Search for:", ["track_artist", "track_name"], key="search_column_2")
+            search_query_2 = st.text_input(f"Please insert {search_column_2}:", key="search_query_2")
+
+            # Save basket in the session, it only contains the track ids (cart.py)
+            if not isinstance(st.session_state.get("cart"), Cart):
+                st.session_state.cart = Cart()
+
+            # Display the number of songs in the basket
+            if st.session_state.cart:
+                st.markdown(f"<div class='song-count'>Chosen songs: {len(st.session_state.cart)}</div>", unsafe_allow_html=True)
+            else:
+                st.markdown("<div class='song-count'>Your basket is empty.</div>", unsafe_allow_html=True)
+
+            # Show search results
+            if search_query_2:
+                # Query tracks by search term (full-text index, best matches first, one page at a time)
+                columns_search_2 = ["track_id", "track_artist", "track_name"]
+                # A new search starts again on the first page
+                if st.session_state.get("last_search_2") != (search_column_2, search_query_2):
+                    st.session_state.last_search_2 = (search_column_2, search_query_2)
+                    st.session_state.page_search_2 = 1
+                # page_search_2 is the key of the page widget, Streamlit removes it while another page is shown
+                page_search_2 = st.session_state.setdefault("page_search_2", 1)
+                spotify_songs_df_search_2, total_search_2 = search_tracks(conn_songs_db, search_column_2, search_query_2,
+                                                                          columns_search_2, page=page_search_2)
+
+                if not spotify_songs_df_search_2.empty:
+                    st.write("Select songs to add them to the basket:")
+                    st.number_input(f"Page (of {page_count(total_search_2)})", min_value=1, max_value=page_count(total_search_2),
+                                    key="page_search_2")
+
+                    # A song can be listed in several playlists, it is shown only once
+                    spotify_songs_df_search_2 = spotify_songs_df_search_2.drop_duplicates("track_id")
+                    page_track_ids = spotify_songs_df_search_2["track_id"].tolist()
+
+                    # Add or remove all songs of this page at once
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.button("Add all songs of this page", on_click=add_to_cart, args=(page_track_ids,))
+                    with col2:
+                        st.button("Remove all songs of this page", on_click=remove_from_cart, args=(page_track_ids,))
+
+                    # The songs of the page are shown as a list of checkboxes or as one table with selectable rows
+                    result_view_2 = st.radio("Show songs as:", ["List", "Table"], horizontal=True, key="result_view_2")
+                    if result_view_2 == "Table":
+                        # One widget for the whole page, selected rows can be added to the basket at once
+                        grid_2 = spotify_songs_df_search_2[["track_name", "track_artist"]].assign(
+                            in_basket=[track_id in st.session_state.cart for track_id in page_track_ids])
+                        selection_2 = st.dataframe(grid_2, hide_index=True, use_container_width=True,
+                                                   on_select="rerun", selection_mode="multi-row",
+                                                   key=f"grid_search_2_{search_column_2}_{search_query_2}_{page_search_2}")
+                        selected_ids_2 = [page_track_ids[row] for row in selection_2.selection.rows]
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.button("Add selected songs", on_click=add_to_cart, args=(selected_ids_2,),
+                                      disabled=not selected_ids_2)
+                        with col2:
+                            st.button("Remove selected songs", on_click=remove_from_cart, args=(selected_ids_2,),
+                                      disabled=not selected_ids_2)
+                    else:
+                        for track_id, track_name, track_artist in spotify_songs_df_search_2[columns_search_2].itertuples(index=False):
+                            # The track id is the unique key of the checkbox
+                            checkbox_key = f"checkbox_{track_id}"
+                            is_checked = track_id in st.session_state.cart
+                            # The state of the checkbox is kept in session_state (the basket buttons change it too)
+                            if checkbox_key not in st.session_state:
+                                st.session_state[checkbox_key] = is_checked
+                            checked = st.checkbox(
+                                f"{track_name} von {track_artist}", 
+                                key=checkbox_key
+                            )
+                            if checked and not is_checked:
+                                # Add to basket
+                                st.session_state.cart.add(track_id)
+                            elif not checked and is_checked:
+                                # Delete from basket
+                                st.session_state.cart.remove(track_id)
+                else:
+                    # Display message if no hits are found
+                    st.warning("No match found. Try another entry.")
+
+            # Show basket (always visible)
+            if st.session_state.cart:
+                st.write("Your basket:")
+                # Names and artists are looked up in the catalog
+                for track in cart_tracks(st.session_state.cart, ["track_name", "track_artist"], context.catalog_csv).itertuples():
+                    col1, col2 = st.columns([5, 1])
+                    with col1:
+                        st.markdown(f"<div class='song-list'><b>{track.track_name}</b> - <i>{track.track_artist}</i></div>", unsafe_allow_html=True)
+                    with col2:
+                        st.button(f"❌", key=f"remove_cart_{track.track_id}", help="Löschen",
+                                  on_click=remove_from_cart, args=([track.track_id],))
+
+            # Initialize session_state
+            if "similar_songs_generated" not in st.session_state:
+                st.session_state.similar_songs_generated = False
+
+            if "save_playlist_clicked" not in st.session_state:
+                st.session_state.save_playlist_clicked = False
+
+            # Initialize empty dataframe
+            if "user_songs_df_similar" not in st.session_state:
+                st.session_state.user_songs_df_similar = pd.DataFrame()  # Fallback for later access
+
+#*********************************************************
+# 8. Supervised Machine learning, nearest neighbor 
+#*********************************************************
+
+            # Show button only if there are at least 5 songs in the basket
+            if len(st.session_state.cart) >= 5:
+
+                # User can choose how many songs the new playlist should have and how the songs of the basket are combined
+                defined_n_neighbors = st.slider("Number of similar songs to find:", min_value=10, max_value=300, value=50, step=10)
+                recommendation_mode = st.selectbox("How should your songs be combined?", list(RECOMMENDATION_MODES),
+                                                   format_func=RECOMMENDATION_MODES.get)
+
+                if st.button("Find similar songs"):
+                    # Create DataFrame 'selected_tracks_df for the users chosen songs (audio features from the catalog)
+                    selected_tracks_df = cart_tracks(st.session_state.cart, FEATURE_COLUMNS, context.catalog_csv)
+
+                    # Use the prebuilt nearest neighbour index (fitted once per catalog version, see knn_index.py).
+                    # The audio features are scaled and weighted (features.py), so fewer neighbours per song are needed
+                    from knn_index import load_knn_index
+
+                    # Search for similar songs for all selected tracks in one query, the songs of the basket are left out.
+                    # The learning parameters are the audio features of the catalog (catalog.FEATURE_COLUMNS)
+                    knn = load_knn_index(context.catalog_csv)
+                    selected_features = selected_tracks_df[FEATURE_COLUMNS].values
+                    user_songs_df_similar = recommend_tracks(knn, context.catalog, selected_features, selected_tracks_df["track_id"],
+                                                             defined_n_neighbors, recommendation_mode)
+
+                    # Save into st.session_state for further processing
+                    st.session_state.user_songs_df_similar = user_songs_df_similar
+
+                    # Show results
+                    st.subheader("Similar songs")
+                    st.dataframe(user_songs_df_similar, use_container_width=True, height=400) # the recommended songs are displayed in the dataframe
+
+                    # refresh state
+                    st.session_state.similar_songs_generated = True
+                    st.session_state.save_playlist_clicked = False
+
+            # Save button is shown if songs have been generated 
+            if st.session_state.similar_songs_generated and not st.session_state.save_playlist_clicked:
+                st.write("Do you like the songs? Save now!")
+
+                # Playlist name input
+                playlist_name = st.text_input("Enter a name for your playlist:", "My Playlist") #name the new created playlist before adding it to the database
+
+                if st.button("Save Playlist"):
+                    # Assure that the datafram is not empty
+                    if not st.session_state.user_songs_df_similar.empty:
+                        try:
+                            # Only the track ids, their order and scores are saved, the other columns come from the catalog
+                            save_playlist(st.session_state.user_id, playlist_name,
+                                          st.session_state.user_songs_df_similar["track_id"],
+                                          st.session_state.user_songs_df_similar["score"],
+                                          library_path=context.library_db, csv_path=context.catalog_csv)
+
+                            st.success(f"The '{playlist_name}' has been saved successfully!")
+                            st.session_state.similar_songs_generated = False
+                        except Exception as e:
+                            st.error(f"Error when saving the playlist: {e}")
+                    else:
+                        st.error("No songs to save available!")
@@ -0,0 +1,131 @@
+import re
+import hashlib
+from datetime import datetime
+import streamlit as st
+from db import connection
+from auth import (hash_password, authenticate, create_session, get_session, end_session,
+                  AuthBusyError, LoginRateLimitError)
+
+#**********************************************************
+# 3. Login process and defining functions
+#**********************************************************
+
+# Passwords are hashed with bcrypt in a worker pool, logins are rate limited per username (auth.py)
+
+# Function that creates an User-ID to new registrated Users
+def generate_user_id(username):
+    timestamp = datetime.now().strftime("%H%M%S")  # User ID based on second, minute and hour of first registration
+    data = f"{username}{timestamp}"
+    user_hash = hashlib.md5(data.encode()).hexdigest()[:5]  # Shortens the hash to 5 characters
+    return user_hash
+
+
+# Function to check password safety
+def check_password_strength(password):
+    # Conditions for a strong password:
+    # 1. At least 8 characters
+    # 2. At least one uppercase letter
+    # 3. At least one lowercase letter
+    # 4. At least one number
+    #re librarie checks if the password meets the conditions
+    if len(password) < 8:
+        return "Weak", "The password must be at least 8 characters long."
+    if not re.search(r"[A-Z]", password):
+        return "Weak", "The password must contain at least one uppercase letter."
+    if not re.search(r"[a-z]", password):
+        return "Weak", "The password must contain at least one lowercase letter."
+    if not re.search(r"[0-9]", password):
+        return "Weak", "The password must contain at least one number."
+
+    return "Strong", "The password is strong!"
+
+
+# Function for registration of first-time users
+def register_user(context, username, password):
+    if user_exists(context, username):
+        st.warning("Username already exists!")
+    else:
+        user_id = generate_user_id(username)
+        try:
+            hashed_password = hash_password(password)
+        except AuthBusyError as e:
+            st.error(str(e))
+            return
+        with connection(context.users_db) as conn_users:
+            conn_users.execute("INSERT INTO users (user_id, username, password) VALUES (?, ?, ?)", 
+                               (user_id, username, hashed_password))
+
+        st.success(f"Registration successful! Your user-ID is: {user_id}. Login now!")
+
+
+# Function checks whether user exists
+def user_exists(context, username):
+    with connection(context.users_db) as conn_users:
+        return conn_users.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+
+
+# Check if username and password are already registrated
+def login_user(context, username, password):
+    user_id = authenticate(context.users_db, username, password)
+    if user_id:
+        st.session_state.user_id = user_id  # user_id is saved in st.session_state
+        st.session_state.auth_token = create_session(user_id, username)
+    return user_id  # Returns the user_id
+
+
+# Logout ends the session, the token is no longer valid
+def logout_user():
+    end_session(st.session_state.get("auth_token"))
+    st.session_state.update({"logged_in": False, "username": "", "user_id": "", "show_legend": False, "auth_token": None})
+
+
+# Login and registration in the sidebar, called on every rerun before the pages
+def render_login(context):
+    context.load(["users_db"])
+
+    # On every rerun the session token is checked (a lookup, the password is not verified again)
+    if st.session_state.logged_in and get_session(st.session_state.get("auth_token")) is None:
+        logout_user()
+
+    # Opens sidebar if Sign in Button has been clicked
+    if st.session_state.sidebar_open:
+        st.sidebar.title("Login & Registration")
+
+        # User chooses to log in or to registrate
+        with st.sidebar:
+            if not st.session_state.logged_in:
+                option = st.selectbox("Choose an action:", ["Login", "Registration"])
+
+                username = st.text_input("Username")
+                password = st.text_input("Password", type="password")
+
+                if option == "Registration":
+                    strength, message = None, None  # Initialisierung der Variablen
+                    if username and password:
+                        # Checks if the password is strong 
+                        strength, message = check_password_strength(password) #conditions from above
+                    if strength == "Weak":
+                        st.error(f"Weak password: {message}")
+                    else:
+                        if st.button("Registration"): 
+                            register_user(context, username, password)
+                        else:
+                            st.warning("Bitte Benutzername und Passwort eingeben.")
+                elif option == "Login":
+                    if st.button("Login"):
+                        try:
+                            user_id = login_user(context, username, password)
+                        except (AuthBusyError, LoginRateLimitError) as e:
+                            st.error(str(e))
+                        else:
+                            if user_id:
+                                st.session_state.logged_in = True
+                                st.session_state.username = username
+                                st.session_state.user_id = user_id
+                                st.success(f"Welcome, {username}!")
+                            else:
+                                st.error("Incorrect user name or password.")
+            else:
+                st.sidebar.success(f"Logged in as: {st.session_state.username}")
+                st.sidebar.write(f"Your user-ID: {st.session_state.user_id}")
+                st.sidebar.button("Logout", on_click=logout_user)
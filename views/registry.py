@@ -0,0 +1,44 @@
+from tracing import span
+
+#***************************************************************
+# Registry of the pages of the app
+#***************************************************************
+
+# Registered pages in the order of the navigation: name -> Page
+PAGES = {}
+
+
+# A page of the app. needs are the resources (see context.RESOURCES) that are loaded before the page
+# is rendered, the other resources are not touched while the user looks at the page.
+class Page:
+    def __init__(self, name, render, needs=(), navigation=True):
+        self.name = name
+        self.render = render
+        self.needs = tuple(needs)
+        # Pages without navigation entry are shown below every page (e.g. the visualizations)
+        self.navigation = navigation
+
+
+# Decorator to register the render function of a page:
+#     @register_page("Search", needs=["songs_db"])
+#     def render(context):
+#         ...
+def register_page(name, needs=(), navigation=True):
+    def decorator(render):
+        PAGES[name] = Page(name, render, needs, navigation)
+        return render
+    return decorator
+
+
+# Names of the pages shown in the navigation
+def navigation_pages():
+    return [page.name for page in PAGES.values() if page.navigation]
+
+
+# Loads the resources the page needs and renders it, both are measured as spans (tracing.py)
+def render_page(name, context):
+    page = PAGES[name]
+    with span(f"page.{name}"):
+        with span("page.resources", needs=",".join(page.needs)):
+            context.load(page.needs)
+        page.render(context)
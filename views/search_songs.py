@@ -0,0 +1,93 @@
+import streamlit as st
+from db import connection
+from search import search_tracks, page_count, MAX_COUNT
+from views.registry import register_page
+
+#************************************************************************
+#5. Dynamik search feature (search by track_name, playlist_name & artist_name)
+#************************************************************************
+
+@register_page("Search", needs=["songs_db"])
+def render(context):
+    # initialize connection
+    with connection(context.songs_db) as conn_songs_db:
+
+        # Expander which stays open and doesn't need to be openend
+        st.header("Search songs")
+        with st.expander("Open to see more", expanded= True):
+            st.write("Get inspired by searching songs by artist, name or genre!")
+
+
+            # Add dynamik search-option
+            search_column_1 = st.selectbox("Search for:", ["track_artist", "track_name", "playlist_genre"], key="search_column_1")
+            search_query_1 = st.text_input(f"Please insert {search_column_1}:", key="search_query_1")
+
+
+            # Show results of the search (full-text index, best matches first, one page at a time)
+            if search_query_1:
+                columns_search_1 = ["playlist_name", "track_artist", "track_name", "danceability", "energy", "loudness", "speechiness",
+                                    "instrumentalness", "liveness", "valence", "tempo", "duration_ms"]
+                # A new search starts again on the first page
+                if st.session_state.get("last_search_1") != (search_column_1, search_query_1):
+                    st.session_state.last_search_1 = (search_column_1, search_query_1)
+                    st.session_state.page_search_1 = 1
+                # page_search_1 is the key of the page widget, Streamlit removes it while another page is shown
+                page_search_1 = st.session_state.setdefault("page_search_1", 1)
+                spotify_songs_df_search_1, total_search_1 = search_tracks(conn_songs_db, search_column_1, search_query_1,
+                                                                          columns_search_1, page=page_search_1)
+                if not spotify_songs_df_search_1.empty:
+                    # Show results if songs were found
+                    st.dataframe(spotify_songs_df_search_1, use_container_width=True, height=400)
+                    st.number_input(f"Page (of {page_count(total_search_1)})", min_value=1, max_value=page_count(total_search_1),
+                                    key="page_search_1")
+                    st.caption(f"{total_search_1}{'+' if total_search_1 >= MAX_COUNT else ''} songs found")
+                else:
+                # Display message if no hits are available
+                    st.warning("No match found. Try another entry.")
+
+                # Show legend button after successful search
+                if st.button("Explanation of the Audio Features", key="audio_features"):
+                    st.session_state.show_legend = not st.session_state.show_legend
+
+                # Show description if legend is activated
+                if st.session_state.show_legend:
+                    st.markdown("""
+                    ### Danceability
+                    Indicates how suitable a track is for dancing. It is based on a combination of elements such as tempo, rhythm stability, beat strength and overall rhythm.   
+                    **Scale:** 0.0 to 1.0 (higher value = more danceable).
+
+                    ### Energy
+                    Indicates the level of intensity and activity of a track. Tracks with high energy have a fast tempo, a strong beat and loud instruments.    
+                    **Scale:** 0.0 to 1.0 (higher value = more energetic).
+
+                    ### Valence
+                    Indicates the musical positivity of a track. Tracks with a high valence sound cheerful, happy and euphoric.   
+                    **Scale:** 0.0 to 1.0 (higher value = more positive).
+
+                    ### Tempo
+                    The estimated tempo of the track in beats per minute (BPM).    
+                    **Unit:** Beats per minute (BPM).
+
+                    ### Speechiness
+                    Indicates the proportion of spoken words in a track. High values indicate more spoken content (e.g. podcasts, audiobooks, rap).  
+                    **Scale:** 
+                    - Values above 0.66: Probably pure spoken content.
+                    - 0.33-0.66: Mixture of music and spoken content.
+                    - Below 0.33: Mainly music.
+
+                    ### Liveness
+                    Indicates the probability that the track was performed in front of a live audience. 
+                    **Scale:** 0.0 to 1.0 (higher value = more live character). Values above 0.8 indicate live recordings.
+
+                    ### Instrumentalness
+                    Estimates how instrumental a track is. Higher values indicate that the track contains little or no vocals.
+                    **Scale:** 0.0 to 1.0 (values close to 1.0 indicate pure instrumental music).
+
+                    ### Loudness
+                    Indicates the average volume of the track in decibels (dB). 
+                    **Unit:** Decibel (dB).
+
+                    ### Duration_ms
+                    The length of the track in milliseconds.   
+                    **Unit:** Milliseconds (ms).
+                    """)
@@ -0,0 +1,97 @@
+import streamlit as st
+from catalog import FEATURE_COLUMNS
+from db import connection
+from library import load_user_analytics
+from analytics import catalog_histograms
+from views.registry import register_page
+
+#******************************************************
+# 9. Visualizations
+#******************************************************
+
+# function to get the top 10 artists
+def get_user_top_artists(context, user_id):
+    try:
+        # The counts are precomputed when a playlist is saved (analytics.py)
+        summary = load_user_analytics(user_id, context.library_db, context.catalog_csv)
+
+        if summary["artists"].empty:
+            st.warning("Keine Songs in der Datenbank gefunden.")
+            return
+
+        # Top 10 artists from a user (the chart is drawn by the browser, charts.py)
+        from charts import top_artists_chart
+        st.plotly_chart(top_artists_chart(user_id, summary), use_container_width=True)
+
+    except Exception as e:
+        st.error(f"Fehler beim Zugriff auf die Datenbank: {e}")
+
+
+# function to show the distribution of the different genres
+def plot_genre_distribution(context, user_id):
+    try:
+        summary = load_user_analytics(user_id, context.library_db, context.catalog_csv)
+
+        if summary["genres"].empty:
+            st.warning("No genre data available.")
+            return
+
+        # Plot
+        from charts import genre_chart
+        st.plotly_chart(genre_chart(user_id, summary), use_container_width=True)
+
+    except Exception as e:
+        st.error(f"Error while calling the genres: {e}")
+
+
+# Function to show the distribution of any audio feature, optionally compared with all songs of the catalog
+def plot_audio_feature_distribution(context, user_id, feature, compare=False):
+    try:
+        # Histogram with the bins of the whole catalog, precomputed when a playlist is saved
+        summary = load_user_analytics(user_id, context.library_db, context.catalog_csv)
+
+        if not summary["histograms"][feature][0].any():
+            st.warning(f"No data for {feature} available.")
+            return
+
+        # The histograms of all songs are written by ingest.py and read once per process
+        histograms_all = None
+        if compare:
+            # Only the comparison needs the songs database
+            context.load(["songs_db"])
+            with connection(context.songs_db) as conn_songs_db:
+                histograms_all = catalog_histograms(conn_songs_db, context.songs_db, context.catalog_csv)
+
+        # Plot
+        from charts import feature_histogram_chart
+        st.plotly_chart(feature_histogram_chart(user_id, summary, feature, histograms_all), use_container_width=True)
+
+    except Exception as e:
+        st.error(f"Fehler beim Abrufen von {feature}: {e}")
+
+
+# The visualizations are shown below every page, they only read the precomputed statistics of the user
+@register_page("Explore your music data", needs=["catalog", "library"], navigation=False)
+def render(context):
+    # Sidebar: Choose the visualisation you want to open
+    visualization_option = st.sidebar.selectbox(
+        "Choose a visualization:",
+        ["Top 10 Artists", "Genre Distribution", "Audio Feature Distribution"]
+    )
+    if visualization_option == "Audio Feature Distribution":
+        # Every audio feature can be shown, switching only changes the chart (no database access)
+        distribution_feature = st.sidebar.selectbox("Audio feature:", FEATURE_COLUMNS,
+                                                    index=FEATURE_COLUMNS.index("valence"))
+        compare_with_catalog = st.sidebar.checkbox("Compare with all songs")
+    # Page, where the visualisation is shown
+    st.subheader("Explore your music data")
+    # Framing to show the plots
+    col1, col2, col3= st.columns([1,4,1])
+    # The visualisation that was chosen in the sidebar is displayed. 
+    with col2:
+        if visualization_option == "Top 10 Artists":
+            get_user_top_artists(context, st.session_state.user_id)
+        elif visualization_option == "Genre Distribution":
+            plot_genre_distribution(context, st.session_state.user_id)
+        elif visualization_option == "Audio Feature Distribution":
+            plot_audio_feature_distribution(context, st.session_state.user_id, distribution_feature, compare_with_catalog)
@@ -0,0 +1,42 @@
+import streamlit as st
+from library import load_user_songs
+from views.registry import register_page
+
+#*****************************************************************
+# 4. Individual Database
+#*****************************************************************
+
+# Access to the user's database (Personal Songs)
+def load_user_db(context):
+    columns_playlist_overview = ["created_at", "playlist_id", "playlist_name", "track_name", "track_artist", "track_album_name",
+                                 "playlist_genre", "playlist_subgenre"]
+    user_songs_df_overview = load_user_songs(st.session_state.user_id, columns_playlist_overview, distinct=True,
+                                             library_path=context.library_db, csv_path=context.catalog_csv)
+    # Newest playlist first (same order as load_user_songs), the songs of a playlist stay in their order (stable sort)
+    user_songs_df_overview = user_songs_df_overview.sort_values(by=["created_at", "playlist_id"], ascending=False,
+                                                                kind="stable")
+    return user_songs_df_overview.drop(columns=["created_at", "playlist_id"]).reset_index(drop=True)
+
+
+# Show user database after successful login (only a small part)
+@register_page("Your Songs", needs=["catalog", "library"])
+def render(context):
+    # Hauptseiten basierend auf der Auswahl
+    st.subheader("Songs picked for you:")
+
+
+    # Check if user_id is set in session state
+    if 'user_id' not in st.session_state:
+        st.session_state.user_id = 'default_user'  # Replace with your default user logic
+
+    # Initial load of displayed dataframe (sorted by load_user_db)
+    user_songs_df_overview = load_user_db(context)
+
+    # Display the data and add a refresh button, the new songs appear in the list.
+    if st.button("Refresh"):
+        user_songs_df_overview = load_user_db(context)
+        st.success("Database refreshed!")
+
+    # Displays user data
+    st.dataframe(user_songs_df_overview, use_container_width=True, height=400)
+    st.info("Discover more songs that you could like!")
@@ -0,0 +1,90 @@
+import os
+import time
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from catalog import CATALOG_CSV, load_catalog
+from ingest import SONGS_DB, ensure_catalog_db
+
+#***************************************************************
+# Warm-up of a new server process and startup timings
+#***************************************************************
+
+logger = logging.getLogger(__name__)
+
+# The warm-up can be switched off with WARM_UP=0 (e.g. for quick local tests)
+WARM_UP = os.environ.get("WARM_UP", "1") != "0"
+
+# Durations (seconds) of the startup steps of this process: step -> duration
+startup_timings = {}
+
+_warm_up_thread = None
+_warm_up_lock = threading.Lock()
+
+
+# Measures the duration of a startup step:
+#     with timed("catalog"):
+#         ...
+@contextmanager
+def timed(step):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[step] = time.perf_counter() - start
+        logger.info("%s took %.3f s", step, startup_timings[step])
+
+
+# Loads the heavy resources into the process-wide caches, so the first user does not wait for them:
+# catalog, songs database, filter index, histogram bins and the nearest neighbour index (imports sklearn).
+def warm_up(csv_path=CATALOG_CSV, db_path=SONGS_DB):
+    with timed("warm-up"):
+        with timed("catalog"):
+            load_catalog(csv_path)
+        with timed("songs database"):
+            ensure_catalog_db(csv_path, db_path)
+        with timed("filter index"):
+            from feature_filter import load_filter_index
+            load_filter_index(csv_path)
+        with timed("histogram bins"):
+            from analytics import feature_edges
+            feature_edges(csv_path)
+        with timed("nearest neighbour index"):
+            from knn_index import load_knn_index
+            load_knn_index(csv_path)
+    return startup_timings
+
+
+def _run_warm_up(csv_path, db_path):
+    try:
+        warm_up(csv_path, db_path)
+    except Exception:
+        # The pages load what they need themselves, a failed warm-up only makes the first requests slower
+        logger.exception("Warm-up failed")
+
+
+# Starts the warm-up in a background thread, once per process. It is called at the start of every
+# rerun of the app, the login page is shown while the resources are loaded.
+def start_warm_up(csv_path=CATALOG_CSV, db_path=SONGS_DB):
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is not None or not WARM_UP:
+            return
+        _warm_up_thread = threading.Thread(target=_run_warm_up, args=(csv_path, db_path), name="warm-up", daemon=True)
+        _warm_up_thread.start()
+
+
+# Command line entry point, e.g. to check the startup time of a deployment: python warmup.py
+def main():
+    parser = argparse.ArgumentParser(description="Load all resources of the app once and print the startup timings")
+    parser.add_argument("--csv", default=CATALOG_CSV, help="path of the catalog csv-file")
+    parser.add_argument("--db", default=SONGS_DB, help="path of the songs database")
+    args = parser.parse_args()
+
+    for step, duration in warm_up(args.csv, args.db).items():
+        print(f"{step:<25} {duration:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()